@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the conversion path on synthetic Amazon-shaped reports.
+
+Commands:
+    generate   Write a synthetic report (malformed outer quotes and "" included)
+    run        Time each stage (read, repair, parse with each CSV parser,
+               dtypes, auto-width, write) and each entry point (CLI, Tk
+               worker, Streamlit), with peak memory, and emit the results
+               as JSON
+    repair     Compare the throughput of the quote repair engine with the
+               former per-line loop, against a target in MB/s
+    backends   Compare the Excel writer backends, each in its own process so
+               that peak RSS is measured cleanly
+    startup    Time the start-up of the CLI (help, usage error, small report
+               with and without the csv fast path) and of the Tk GUI with
+               -X importtime, and check that pandas is only loaded when needed
+    compare    Compare two JSON results of 'run', e.g. from two commits
+
+Usage:
+    python benchmark.py generate report.csv --rows 100000 --columns 25
+    python benchmark.py run --rows 200000 --output before.json
+    python benchmark.py compare before.json after.json
+    python benchmark.py repair --rows 500000
+    python benchmark.py backends --rows 500000
+    python benchmark.py startup --rows 1000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HEADER = [
+    "date/heure", "numéro de versement", "type", "numéro de la commande", "sku",
+    "description", "quantité", "marketplace", "traitement", "ville d'origine de la commande",
+    "région d'origine de la commande", "code postal de la commande", "modèle de perception des taxes",
+    "ventes de produits", "taxes sur la vente des produits", "crédits d'expédition",
+    "frais de vente", "frais Expédié par Amazon", "total",
+]
+TYPES = ["Commande", "Remboursement", "Frais de service", "Ajustement", "Transfert"]
+MARKETPLACES = ["amazon.fr", "amazon.de", "amazon.it", "amazon.es", "amazon.co.uk"]
+CITIES = ["Paris", "Lyon", "Marseille", "Toulouse", "Nantes", "Bordeaux", "Lille"]
+
+READ_BLOCK = 1024 * 1024
+
+# Minimum throughput of the repair stage (read + repair, MB/s of input), for
+# fully wrapped and mixed reports alike (see --wrapped-ratio)
+REPAIR_TARGET_MB_S = 120
+
+# Modules whose import is reported by the startup benchmark
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "openpyxl", "xlsxwriter", "tkinterdnd2"]
+
+
+def quote_field(field):
+    return '"' + field.replace('"', '""') + '"'
+
+
+def generate_report(path, rows, columns=len(HEADER), wrapped_ratio=1.0, seed=0):
+    """
+    Write a synthetic Amazon report, including its malformed outer quotes
+
+    Args:
+        path (str): Output CSV path
+        rows (int): Number of data rows
+        columns (int): Number of columns; beyond the standard Amazon header,
+            extra amount columns are added
+        wrapped_ratio (float): Share of rows wrapped in outer quotes with
+            doubled inner quotes, like Amazon does; the others are well-formed CSV
+        seed (int): Random seed, so runs are comparable
+    """
+    rng = random.Random(seed)
+    extra_columns = [f"montant supplémentaire {i}" for i in range(1, columns - len(HEADER) + 1)]
+    header = (HEADER + extra_columns)[:columns]
+
+    with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+        file.write(','.join(f'"{column}"' for column in header) + '\n')
+        for i in range(rows):
+            sales = rng.uniform(5, 300)
+            fields = [
+                f"{rng.randint(1, 28):02d}/10/2024 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00 UTC",
+                str(rng.randint(10000000000, 19999999999)),
+                rng.choice(TYPES),
+                f"40{rng.randint(1, 9)}-{rng.randint(1000000, 9999999)}-{rng.randint(1000000, 9999999)}",
+                f"SKU-{rng.randint(1, 2000):05d}",
+                f'Produit {i % 500} "édition" taille {rng.choice("SMLX")}, lot de {rng.randint(1, 6)}',
+                str(rng.randint(1, 5)),
+                rng.choice(MARKETPLACES),
+                rng.choice(["Amazon", "Vendeur"]),
+                rng.choice(CITIES),
+                "Île-de-France",
+                f"{rng.randint(1000, 95999):05d}",
+                "MarketplaceFacilitator",
+                f"{sales:.2f}".replace('.', ','),
+                f"{sales * 0.2:.2f}".replace('.', ','),
+                "0",
+                f"-{sales * 0.15:.2f}".replace('.', ','),
+                f"-{rng.uniform(2, 6):.2f}".replace('.', ','),
+                f"{sales * 0.8:.2f}".replace('.', ','),
+            ]
+            fields.extend(f"{rng.uniform(-50, 50):.2f}".replace('.', ',') for _ in extra_columns)
+            if rng.random() < wrapped_ratio:
+                # Amazon quotes every field, then wraps the whole row in quotes
+                # and doubles the ones inside
+                row = ','.join(quote_field(field) for field in fields[:columns])
+                row = '"' + row.replace('"', '""') + '"'
+            else:
+                # Well-formed row, quoted only where needed
+                row = ','.join(quote_field(field) if any(c in field for c in ',"\n') else field
+                               for field in fields[:columns])
+            file.write(row + '\n')
+
+
+def format_mb(value):
+    """Format a memory figure in MB, which is None where it is unknown (Windows)"""
+    return "n/a" if value is None else f"{value:.0f}"
+
+
+def measure(func, trace_memory=False):
+    """
+    Run func once and return (result, stats)
+
+    With trace_memory, the peak of Python allocations (numpy included) is
+    recorded with tracemalloc, which slows the run down: timings and memory
+    are therefore measured in separate runs.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    stats = {"seconds": round(seconds, 3)}
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats["tracemalloc_peak_mb"] = round(peak / (1024 * 1024), 1)
+    return result, stats
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_raw(csv_path):
+    with open(csv_path, 'rb') as file:
+        while file.read(READ_BLOCK):
+            pass
+
+
+def read_repaired(csv_path):
+    from converter import open_report
+
+    with open_report(csv_path) as report:
+        while report.read(READ_BLOCK):
+            pass
+
+
+def repair_per_line(csv_path):
+    """
+    The former repair loop, one Python string operation per row (reference)
+
+    Repaired lines are encoded back to UTF-8 in batches, as pandas' C parser
+    did with the text the former reader returned.
+    """
+    with open(csv_path, 'r', encoding='utf-8-sig') as file:
+        lines = []
+        for i, line in enumerate(file):
+            line = line.strip()
+            if i > 0 and line.startswith('"') and line.endswith('"'):
+                line = line[1:-1].replace('""', '"')
+            lines.append(line)
+            if len(lines) >= 10000:
+                data = "\n".join(lines).encode('utf-8')
+                lines = []
+        data = "\n".join(lines).encode('utf-8')
+    return len(data)
+
+
+def benchmark_repair(csv_path, repeat=5):
+    """
+    Print the throughput of the repair engine and of the former per-line loop
+
+    Returns:
+        bool: Whether the repair engine reaches REPAIR_TARGET_MB_S
+    """
+    size_mb = os.path.getsize(csv_path) / (1024 * 1024)
+    print(f"Report size: {size_mb:.1f} MB")
+
+    throughput = {}
+    for name, func in (("read", read_raw), ("per_line", repair_per_line), ("engine", read_repaired)):
+        best = min(measure(lambda: func(csv_path))[1]["seconds"] for _ in range(repeat))
+        throughput[name] = size_mb / best if best else float("inf")
+        print(f"{name:>10}: {best:>7.3f} s, {throughput[name]:>7.1f} MB/s")
+
+    speedup = throughput["engine"] / throughput["per_line"]
+    reached = throughput["engine"] >= REPAIR_TARGET_MB_S
+    print(f"Engine vs per-line loop: x{speedup:.2f}; target {REPAIR_TARGET_MB_S} MB/s "
+          f"{'reached' if reached else 'NOT reached'}")
+    return reached
+
+
+def stage_benchmarks(csv_path, output_dir, engines):
+    """Stages of the conversion path, as (name, callable) in pipeline order"""
+    from converter import column_widths, infer_schema, pyarrow, read_report, write_excel
+
+    state = {}
+
+    def parse_typed(read_engine):
+        state["df"] = read_report(csv_path, schema=state["schema"], read_engine=read_engine)
+        return state["df"]
+
+    def infer():
+        state["schema"] = infer_schema(csv_path)
+
+    stages = [
+        ("read", lambda: read_raw(csv_path)),
+        ("repair", lambda: read_repaired(csv_path)),
+        ("parse", lambda: read_report(csv_path, schema=None, read_engine="c")),
+        ("infer_schema", infer),
+    ]
+    # Each parser in turn; the last one feeds the following stages
+    for read_engine in ["c"] + (["pyarrow"] if pyarrow is not None else []):
+        stages.append((f"parse_typed_{read_engine}", lambda read_engine=read_engine: parse_typed(read_engine)))
+    stages.append(("auto_width", lambda: column_widths(state["df"])))
+    for engine in engines:
+        output = os.path.join(output_dir, f"stage-{engine}.xlsx")
+        stages.append((f"write_{engine}", lambda engine=engine, output=output:
+                       write_excel(state["df"], output, engine=engine)))
+    return stages
+
+
+def entry_point_benchmarks(csv_path, output_dir):
+    """End-to-end conversions through each front end, as (name, callable or skip reason)"""
+    from converter import convert_report
+
+    entry_points = [
+        ("cli", lambda: convert_report(csv_path, os.path.join(output_dir, "cli.xlsx"), streaming=False)),
+        ("cli_streaming", lambda: convert_report(csv_path, os.path.join(output_dir, "cli-streaming.xlsx"),
+                                                 streaming=True)),
+    ]
+
+    try:
+        import gui
+        entry_points.append(("tk_worker", lambda: gui.convert_to_excel(csv_path,
+                                                                       os.path.join(output_dir, "tk.xlsx"))))
+    except ImportError as e:
+        entry_points.append(("tk_worker", f"skipped: {e}"))
+
+    try:
+        import web_gui
+        from converter import run_job
+
+        def streamlit_job():
+            # What a worker process of the Streamlit app runs for one upload
+            job_dir = tempfile.mkdtemp(dir=output_dir)
+            input_path = os.path.join(job_dir, "input.csv")
+            shutil.copyfile(csv_path, input_path)
+            return run_job(job_dir, input_path, os.path.join(job_dir, "output.xlsx"),
+                           {"sheet_name": web_gui.SHEET_NAME})
+
+        entry_points.append(("streamlit", streamlit_job))
+    except ImportError as e:
+        entry_points.append(("streamlit", f"skipped: {e}"))
+
+    return entry_points
+
+
+def run_benchmarks(csv_path, engines, trace_memory=True):
+    """
+    Time every stage and entry point on one report
+
+    Returns:
+        dict: JSON-serializable results
+    """
+    import pandas as pd
+    from converter import count_rows, peak_rss_mb
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "input": {
+            "path": csv_path,
+            "size_mb": round(os.path.getsize(csv_path) / (1024 * 1024), 1),
+            "rows": count_rows(csv_path),
+        },
+        "stages": {},
+        "entry_points": {},
+    }
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for section, benchmarks in (("stages", stage_benchmarks(csv_path, output_dir, engines)),
+                                    ("entry_points", entry_point_benchmarks(csv_path, output_dir))):
+            for name, func in benchmarks:
+                if isinstance(func, str):
+                    results[section][name] = {"skipped": func}
+                    continue
+                _, stats = measure(func)
+                stats["rss_peak_mb"] = peak_rss_mb()
+                stats["rows_per_second"] = round(results["input"]["rows"] / stats["seconds"]) if stats["seconds"] else None
+                if trace_memory:
+                    _, memory = measure(func, trace_memory=True)
+                    stats["tracemalloc_peak_mb"] = memory["tracemalloc_peak_mb"]
+                results[section][name] = stats
+                print(f"{name:>19}: {stats['seconds']:>8.3f} s"
+                      + (f", {stats['tracemalloc_peak_mb']:>8.1f} MB peak" if trace_memory else ""),
+                      file=sys.stderr)
+
+    return results
+
+
+def run_backend(engine, csv_path):
+    """Parse the report, then time writing it with one backend (child process)"""
+    from converter import peak_rss_mb, read_report, write_excel
+
+    df = read_report(csv_path)
+    rss_after_parse = peak_rss_mb()
+
+    output = os.path.join(os.path.dirname(csv_path), f"bench-{engine}.xlsx")
+    start = time.perf_counter()
+    write_excel(df, output, engine=engine)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "engine": engine,
+        "rows": len(df),
+        "write_seconds": round(elapsed, 2),
+        "peak_rss_after_parse_mb": rss_after_parse,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_mb": round(os.path.getsize(output) / (1024 * 1024), 1),
+    }))
+
+
+def compare_results(base_path, new_path):
+    """Print the time ratio of every stage and entry point between two runs"""
+    with open(base_path, 'r', encoding='utf-8') as file:
+        base = json.load(file)
+    with open(new_path, 'r', encoding='utf-8') as file:
+        new = json.load(file)
+
+    if base.get("input", {}).get("rows") != new.get("input", {}).get("rows"):
+        print("Warning: the two runs did not use the same number of rows")
+    print(f"{'':>19}  {base.get('commit') or 'base':>10}  {new.get('commit') or 'new':>10}  change")
+    for section in ("stages", "entry_points"):
+        for name, stats in new.get(section, {}).items():
+            old = base.get(section, {}).get(name, {})
+            if "seconds" not in stats or "seconds" not in old:
+                continue
+            change = (stats["seconds"] / old["seconds"] - 1) * 100 if old["seconds"] else 0
+            print(f"{name:>19}  {old['seconds']:>9.3f}s  {stats['seconds']:>9.3f}s  {change:+6.1f}%")
+
+
+def parse_importtime(stderr):
+    """
+    Cumulative import time of each top-level import from -X importtime output
+
+    Returns:
+        dict: Module name -> seconds
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module that imported them
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def imported_modules(stderr):
+    """Names of every module imported, at any depth, from -X importtime output"""
+    return {line.rsplit("|", 1)[1].strip() for line in stderr.splitlines()
+            if line.startswith("import time:")}
+
+
+def benchmark_startup(csv_path, repeat=5):
+    """
+    Print the wall time and import time of each start-up path, best of repeat
+
+    Returns:
+        bool: Whether the help and usage error paths stay clear of pandas
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output = os.path.join(os.path.dirname(csv_path), "startup.xlsx")
+    commands = [
+        ("python", ["-c", "pass"]),
+        ("help", ["main.py", "--help"]),
+        ("usage_error", ["main.py"]),
+        ("convert_fast", ["main.py", csv_path, output]),
+        ("convert_pandas", ["main.py", csv_path, output, "--read-engine", "c"]),
+        ("gui_import", ["-c", "import gui"]),
+    ]
+    print(f"Report size: {os.path.getsize(csv_path) / 1024:.0f} KB")
+
+    clean = True
+    for name, arguments in commands:
+        best, modules, imported = None, {}, set()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, "-X", "importtime"] + arguments,
+                                    capture_output=True, text=True, cwd=script_dir)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best, modules, imported = elapsed, parse_importtime(result.stderr), imported_modules(result.stderr)
+        if result.returncode not in (0, 2) and name != "usage_error":
+            print(f"{name:>15}: failed\n{result.stderr.strip().splitlines()[-1]}")
+            continue
+        heavy = [module for module in HEAVY_MODULES if module in imported]
+        print(f"{name:>15}: {best:>6.3f} s, imports {sum(modules.values()):>6.3f} s"
+              + (f", loads {', '.join(heavy)}" if heavy else ""))
+        if name in ("help", "usage_error") and "pandas" in imported:
+            clean = False
+    print(f"pandas {'stays out of' if clean else 'is imported by'} the help and usage error paths")
+    return clean
+
+
+def benchmark_backends(rows, engines):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "report.csv")
+        print(f"Generating {rows} rows...")
+        generate_report(csv_path, rows)
+        print(f"Report size: {os.path.getsize(csv_path) / (1024 * 1024):.1f} MB")
+
+        for engine in engines:
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "run-backend", engine, csv_path],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                print(f"{engine}: failed\n{result.stderr.strip()}")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{engine:>10}: {stats['write_seconds']:>7.2f} s write, "
+                  f"peak RSS {format_mb(stats['peak_rss_mb'])} MB "
+                  f"({format_mb(stats['peak_rss_after_parse_mb'])} MB after parse), "
+                  f"{stats['output_mb']:.1f} MB xlsx")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the Amazon CSV to Excel conversion")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic Amazon report")
+    generate.add_argument("path", help="Output CSV file")
+    generate.add_argument("--rows", type=int, default=100000, help="Data rows (default: 100000)")
+    generate.add_argument("--columns", type=int, default=len(HEADER),
+                          help=f"Columns (default: {len(HEADER)})")
+    generate.add_argument("--wrapped-ratio", type=float, default=1.0,
+                          help="Share of rows with Amazon's outer quotes (default: 1.0)")
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="Time each stage and entry point, emit JSON")
+    run.add_argument("--input", default=None, help="Existing CSV report (default: generate one)")
+    run.add_argument("--rows", type=int, default=100000, help="Rows of the generated report (default: 100000)")
+    run.add_argument("--columns", type=int, default=len(HEADER), help="Columns of the generated report")
+    run.add_argument("--engines", nargs="+", default=None,
+                     help="Excel backends to time (default: all installed)")
+    run.add_argument("--no-tracemalloc", action="store_true",
+                     help="Skip the tracemalloc runs (timings only)")
+    run.add_argument("--output", default=None, help="JSON results file (default: stdout)")
+
+    repair = commands.add_parser("repair", help="Compare repair throughput with the former per-line loop")
+    repair.add_argument("--input", default=None, help="Existing CSV report (default: generate one)")
+    repair.add_argument("--rows", type=int, default=500000, help="Rows of the generated report (default: 500000)")
+    repair.add_argument("--wrapped-ratio", type=float, default=1.0,
+                        help="Share of rows with Amazon's outer quotes (default: 1.0)")
+
+    backends = commands.add_parser("backends", help="Compare Excel backends, one process each")
+    backends.add_argument("--rows", type=int, default=500000, help="Rows in the synthetic report (default: 500000)")
+    backends.add_argument("--engines", nargs="+", default=["openpyxl", "xlsxwriter"])
+
+    startup = commands.add_parser("startup", help="Time the start-up paths with -X importtime")
+    startup.add_argument("--input", default=None, help="Small CSV report (default: generate one)")
+    startup.add_argument("--rows", type=int, default=1000, help="Rows of the generated report (default: 1000)")
+    startup.add_argument("--repeat", type=int, default=5, help="Runs per path, the best is kept (default: 5)")
+
+    compare = commands.add_parser("compare", help="Compare two JSON results of 'run'")
+    compare.add_argument("base")
+    compare.add_argument("new")
+
+    run_one = commands.add_parser("run-backend")
+    run_one.add_argument("engine")
+    run_one.add_argument("csv_path")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_report(args.path, args.rows, columns=args.columns,
+                        wrapped_ratio=args.wrapped_ratio, seed=args.seed)
+        print(f"Wrote {args.rows} rows to {args.path}")
+    elif args.command == "run":
+        from converter import EXCEL_BACKENDS, xlsxwriter
+        engines = args.engines or [name for name in EXCEL_BACKENDS if name != "xlsxwriter" or xlsxwriter]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = args.input
+            if csv_path is None:
+                csv_path = os.path.join(tmp_dir, "report.csv")
+                generate_report(csv_path, args.rows, columns=args.columns)
+            results = run_benchmarks(csv_path, engines, trace_memory=not args.no_tracemalloc)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
+        else:
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+    elif args.command == "repair":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = args.input
+            if csv_path is None:
+                csv_path = os.path.join(tmp_dir, "report.csv")
+                generate_report(csv_path, args.rows, wrapped_ratio=args.wrapped_ratio)
+            if not benchmark_repair(csv_path):
+                return 1
+    elif args.command == "startup":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = args.input
+            if csv_path is None:
+                csv_path = os.path.join(tmp_dir, "report.csv")
+                generate_report(csv_path, args.rows)
+            if not benchmark_startup(csv_path, repeat=args.repeat):
+                return 1
+    elif args.command == "backends":
+        benchmark_backends(args.rows, args.engines)
+    elif args.command == "compare":
+        compare_results(args.base, args.new)
+    elif args.command == "run-backend":
+        run_backend(args.engine, args.csv_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3231 @@
+# -*- coding: utf-8 -*-
+"""
+Shared conversion core for the Amazon CSV report tools (CLI, Tk GUI, Streamlit).
+"""
+import codecs
+import contextvars
+import csv
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module, imported on first attribute access
+
+    pandas, numpy, openpyxl and pyarrow make up most of the start-up time of
+    the tools, so they are only loaded once a report is actually parsed or
+    written: 'main.py --help', usage errors and the csv fast path for small
+    reports never import pandas.
+
+    Args:
+        name (str): Module to import
+        submodules (tuple): Submodules imported along with it (e.g. 'csv' for pyarrow.csv)
+    """
+
+    def __init__(self, name, submodules=()):
+        self._name = name
+        self._submodules = submodules
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            # __import__ rather than importlib.import_module, which
+            # python -X importtime does not report
+            for submodule in self._submodules:
+                __import__(f'{self._name}.{submodule}')
+            self._module = __import__(self._name)
+        return getattr(self._module, attribute)
+
+
+def optional_module(name, submodules=()):
+    """LazyModule of an optional dependency, or None when it is not installed"""
+    if importlib.util.find_spec(name) is None:
+        return None
+    return LazyModule(name, submodules)
+
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+openpyxl = LazyModule('openpyxl', ('cell', 'styles', 'utils'))
+
+# Optional, faster writer backend
+xlsxwriter = optional_module('xlsxwriter')
+
+# Optional, multithreaded CSV parser with compact strings
+pyarrow = optional_module('pyarrow', ('csv',))
+
+
+# Bytes read and repaired at a time
+REPAIR_BLOCK_SIZE = 1024 * 1024
+
+# Give up waiting for balanced quotes after this much data (malformed report)
+MAX_REPAIR_CARRY = 64 * REPAIR_BLOCK_SIZE
+
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+# Bytes stripped from both ends of each record, like bytes.strip()
+WHITESPACE = b' \t\n\r\x0b\x0c'
+
+
+def _strip_records(data, starts, ends):
+    """
+    Strip the records data[starts[i]:ends[i]], one byte of every record per pass
+
+    Returns:
+        tuple: New (starts, ends); the same arrays when nothing is stripped
+    """
+    whitespace = np.zeros(256, dtype=bool)
+    whitespace[list(WHITESPACE)] = True
+    while True:
+        lead = starts < ends
+        lead[lead] = whitespace[data[starts[lead]]]
+        if not lead.any():
+            break
+        starts = starts + lead
+    while True:
+        trail = starts < ends
+        trail[trail] = whitespace[data[ends[trail] - 1]]
+        if not trail.any():
+            break
+        ends = ends - trail
+    return starts, ends
+
+
+def _reused_array(buffers, name, size, dtype):
+    """
+    Array of size elements, kept in buffers from one block to the next
+
+    Fresh block-sized arrays cost page faults on every block, as large
+    allocations are given back to the system once freed.
+    """
+    if buffers is None:
+        return np.empty(size, dtype=dtype)
+    array = buffers.get(name)
+    if array is None or len(array) < size:
+        array = buffers[name] = np.empty(size, dtype=dtype)
+    return array[:size]
+
+
+def repair_block(block, buffers=None):
+    """
+    Repair a block of complete data records separated by newlines (bytes)
+
+    A record that is a single quoted field whose inner quotes are all
+    doubled is Amazon's wrapping of a whole row: its outer quotes are
+    removed and "" turned back into ". Other records are kept as-is
+    (stripped), and a newline inside a quoted field does not end a record.
+
+    The whole block is repaired with numpy masks, without a Python loop over
+    its records: the running parity of the quotes tells the newlines that
+    end a record and the quotes with an odd index, which are the ones to
+    drop in a wrapped row (its closing quote and the first quote of each
+    pair), along with its opening quote.
+
+    Args:
+        block (bytes): Records without a trailing newline
+        buffers (dict): Arrays reused for the next blocks (see
+            RepairedCSVReader); None allocates them for this block only
+
+    Returns:
+        bytes: Repaired records, newline-terminated
+    """
+    if b'\r' in block:
+        block = block.replace(b'\r\n', b'\n')
+    data = np.frombuffer(block, dtype=np.uint8)
+    size = len(data)
+    quotes = np.equal(data, QUOTE, out=_reused_array(buffers, 'quotes', size, bool))
+    # True on the bytes preceded by an odd number of quotes, themselves included
+    odd = np.logical_xor.accumulate(quotes, out=_reused_array(buffers, 'odd', size, bool))
+    scratch = np.equal(data, NEWLINE, out=_reused_array(buffers, 'scratch', size, bool))
+
+    # Records end at the newlines preceded by an even number of quotes
+    newlines = np.flatnonzero(scratch)
+    newlines = newlines[~odd[newlines]]
+    raw_starts = np.concatenate(([0], newlines + 1))
+    raw_ends = np.append(newlines, size)
+    starts, ends = _strip_records(data, raw_starts, raw_ends)
+
+    # Wrapped rows start and end with a quote and hold an even number of
+    # them (every record starts after an even number of quotes)...
+    wrapped = ends - starts >= 2
+    candidates = np.flatnonzero(wrapped)
+    last = ends[candidates] - 1
+    wrapped[candidates] = quotes[starts[candidates]] & quotes[last] & ~odd[last]
+    # ...and each of their inner quotes with an odd index (quotes & ~odd) is
+    # followed by another
+    odd_quotes = np.greater(quotes, odd, out=odd)
+    unpaired = np.flatnonzero(np.greater(odd_quotes[:-1], quotes[1:], out=scratch[:-1]))
+    wrapped &= np.searchsorted(unpaired, ends - 1) == np.searchsorted(unpaired, starts + 1)
+
+    keep = np.logical_not(odd_quotes, out=odd_quotes)
+    stripped = starts is not raw_starts or ends is not raw_ends
+    if stripped or not wrapped.all():
+        # Spans of the block: each record, then the separator (or stripped
+        # whitespace) that follows it
+        edges = np.column_stack((starts, ends)).ravel()
+        lengths = np.diff(np.append(edges, size))
+        # Only wrapped rows lose quotes
+        keep[starts[0]:] |= np.repeat(np.column_stack((~wrapped, np.ones_like(wrapped))).ravel(), lengths)
+        if stripped:
+            in_record = np.zeros(size, dtype=bool)
+            in_record[starts[0]:] = np.repeat(np.tile([True, False], len(starts)), lengths)
+            in_record[raw_ends[:-1]] = True
+            keep &= in_record
+    keep[starts[wrapped]] = False
+
+    if b'\0' in block:
+        return data[keep].tobytes() + b'\n'
+    # Zero the dropped bytes, then delete them: faster than a boolean mask
+    repaired = _reused_array(buffers, 'repaired', size + 1, np.uint8)
+    np.multiply(data, keep, out=repaired[:size])
+    repaired[size] = NEWLINE
+    return repaired.tobytes().translate(None, b'\0')
+
+
+class ConversionCancelled(Exception):
+    """Raised by a conversion whose cancel token was set"""
+
+
+class UsageError(ValueError):
+    """Invalid command line or arguments: the conversion is refused before it starts"""
+
+
+class Progress:
+    """
+    Progress of one conversion, reported to a callback, with a cancel token
+
+    The conversion updates it after each block of the report read, each
+    chunk parsed and each batch of rows written (never per row), calls the
+    callback with it, and raises ConversionCancelled at the next update once
+    the token is set. Updates come from the converting thread, or from
+    pyarrow's reader threads while a whole report is parsed with pyarrow.
+
+    Args:
+        callback: Called as callback(progress), or None
+        cancel (threading.Event): Set it to stop the conversion
+        total_bytes (int): Size of the report (default: set by convert_report)
+
+    Attributes:
+        bytes_read (int): Bytes of the report read so far
+        rows_parsed (int): Data rows parsed so far
+        rows_written (int): Data rows written to the output so far
+    """
+
+    def __init__(self, callback=None, cancel=None, total_bytes=None):
+        self.callback = callback
+        self.cancel = cancel
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows_parsed = 0
+        self.rows_written = 0
+
+    @property
+    def fraction(self):
+        """
+        Share of the conversion done, from 0 to 1: reading the report is the
+        first half, writing the rows parsed so far the second one
+        """
+        if not self.total_bytes:
+            return 0.0
+        read = min(self.bytes_read / self.total_bytes, 1.0)
+        written = self.rows_written / self.rows_parsed if self.rows_parsed else 0.0
+        return read * (1 + written) / 2
+
+    def update(self, bytes_read=0, rows_parsed=0, rows_written=0):
+        """Add to the counters, then stop the conversion if cancelled, else report"""
+        self.bytes_read += bytes_read
+        self.rows_parsed += rows_parsed
+        self.rows_written += rows_written
+        if self.cancel is not None and self.cancel.is_set():
+            raise ConversionCancelled("Conversion cancelled")
+        if self.callback is not None:
+            self.callback(self)
+
+
+# Structured logs of the conversions (see log_conversion)
+logger = logging.getLogger('converter')
+
+# Set to send them to stderr as JSON lines, in worker processes as well
+LOG_JSON_ENV = 'CONVERTER_LOG_JSON'
+
+STAGES = ['read', 'repair', 'infer_schema', 'parse', 'dtype_cast', 'aggregate', 'store', 'column_sizing',
+          'write']
+
+
+class StageTimes:
+    """
+    Time spent in each stage of one conversion
+
+    Stages nest (the repair reads the report, writing converts the rows): a
+    stage is only charged its own time, the time of the stages run inside it
+    is charged to them. Stages run in several threads (pyarrow reads the
+    report in its own threads) are summed, so the total can exceed the wall
+    time of the conversion.
+
+    Attributes:
+        seconds (dict): Seconds spent per stage name
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name):
+        """Charge the time of the block, minus the stages nested in it, to a stage"""
+        stack = self._local.__dict__.setdefault('stack', [])
+        # Time of the nested stages, subtracted from this one
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - nested
+
+    def rounded(self):
+        """Seconds per stage in STAGES order, rounded to the millisecond"""
+        order = {name: index for index, name in enumerate(STAGES)}
+        return {name: round(self.seconds[name], 3)
+                for name in sorted(self.seconds, key=lambda name: order.get(name, len(STAGES)))}
+
+
+# StageTimes of the conversion being logged in this context, if any
+_stage_times = contextvars.ContextVar('stage_times', default=None)
+
+_NO_STAGE = nullcontext()
+
+
+def stage(name, times=None):
+    """
+    Context manager timing a stage of the conversion being logged
+
+    Without a conversion being logged it does nothing, at the cost of a
+    context variable lookup: stages are timed per block or chunk, never per
+    row.
+
+    Args:
+        name (str): Stage name, one of STAGES
+        times (StageTimes): Conversion to charge (default: the one of the
+            current context, which threads started by pyarrow do not share)
+    """
+    if times is None:
+        times = _stage_times.get()
+    return _NO_STAGE if times is None else times.stage(name)
+
+
+def peak_rss_mb():
+    """Peak resident memory of the process in MB, or None where unknown (Windows)"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+@contextmanager
+def log_conversion(**fields):
+    """
+    Time the stages of the conversion run in the block and log it
+
+    When the 'converter' logger is enabled for INFO, one record is logged
+    per conversion with its fields, its duration, the seconds per stage, the
+    peak memory of the process and rows per second, or the error it failed
+    with (status 'failed', or 'error' for a UsageError: the conversion was
+    refused before it started). Otherwise nothing is timed.
+
+    Args:
+        **fields: Fields of the record (input, output...)
+
+    Yields:
+        dict: The fields, for the block to complete (rows, read_engine...),
+            or None when the conversion is not logged
+    """
+    # Nested conversions (an incremental rebuild) are part of the outer one
+    if _stage_times.get() is not None or not logger.isEnabledFor(logging.INFO):
+        yield None
+        return
+
+    times = StageTimes()
+    token = _stage_times.set(times)
+    start = time.perf_counter()
+
+    def finish(status):
+        seconds = time.perf_counter() - start
+        fields.update(status=status, seconds=round(seconds, 3), stages=times.rounded(),
+                      peak_rss_mb=peak_rss_mb())
+        if status == 'ok' and fields.get('rows') and seconds:
+            fields['rows_per_second'] = round(fields['rows'] / seconds)
+        return {'event': 'conversion', **fields}
+
+    try:
+        yield fields
+    except ConversionCancelled:
+        logger.info("Conversion cancelled: %s", fields.get('input'), extra={'fields': finish('cancelled')})
+        raise
+    except UsageError as e:
+        fields.update(error=str(e).strip(), error_type=type(e).__name__)
+        logger.error("Conversion refused: %s", fields['error'], extra={'fields': finish('error')})
+        raise
+    except Exception as e:
+        fields.update(error=str(e).strip(), error_type=type(e).__name__)
+        logger.error("Conversion failed: %s", fields.get('input'), extra={'fields': finish('failed')})
+        raise
+    finally:
+        _stage_times.reset(token)
+    logger.info("Converted %s", fields.get('input'), extra={'fields': finish('ok')})
+
+
+class JSONLogFormatter(logging.Formatter):
+    """Formats each record as one JSON object, with the fields passed in extra={'fields': ...}"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['traceback'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def enable_json_logs(stream=None):
+    """
+    Log the conversions as JSON lines to stderr (or stream)
+
+    Also sets CONVERTER_LOG_JSON, so that worker processes started
+    afterwards log their conversions too. Calling it again does nothing.
+    """
+    os.environ[LOG_JSON_ENV] = '1'
+    if not any(isinstance(handler.formatter, JSONLogFormatter) for handler in logger.handlers):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JSONLogFormatter())
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+if os.environ.get(LOG_JSON_ENV):
+    enable_json_logs()
+
+
+class RepairedCSVReader:
+    """
+    File-like adapter that repairs Amazon's malformed quoting block by block.
+
+    Amazon exports wrap every data row in an extra pair of quotes and double
+    the quotes inside it. The header row is passed through untouched, data
+    rows get their outer quotes removed and "" turned back into ". The
+    report is read in blocks cut at record boundaries (never inside a quoted
+    field) and repaired lazily as the CSV parser asks for more data, so it
+    is never held in memory as a whole.
+
+    Repair works on UTF-8 bytes, which pandas' C parser consumes directly,
+    so the report is never decoded into Python strings.
+
+    Args:
+        source: Binary file-like object (UTF-8), or text file-like object
+            (re-encoded to UTF-8 as it is read)
+        block_size (int): Bytes read and repaired at a time
+        progress (Progress): Updated with the bytes read, once per block
+    """
+
+    def __init__(self, source, block_size=REPAIR_BLOCK_SIZE, progress=None):
+        self._file = source
+        self._block_size = block_size
+        self._progress = progress
+        # Captured here: pyarrow reads from its own threads
+        self._times = _stage_times.get()
+        self._header_done = False
+        self._eof = False
+        self._carry = b''
+        self._buffer = b''
+        self._offset = 0
+        # Arrays of repair_block, reused from one block to the next
+        self._arrays = {}
+
+    # Checked by pyarrow before reading from a Python file object
+    closed = False
+
+    def _read_raw(self):
+        with stage('read', self._times):
+            data = self._file.read(self._block_size)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self._progress is not None:
+            self._progress.update(bytes_read=len(data))
+        return data
+
+    def _fill(self):
+        """Repair the next block into the buffer; False once the report is exhausted"""
+        if self._eof and not self._carry:
+            return False
+
+        text = self._carry
+        while True:
+            data = self._read_raw()
+            if not data:
+                self._eof = True
+            text += data
+
+            if self._eof:
+                block, self._carry = text.rstrip(b'\r\n'), b''
+                break
+            cut = text.rfind(b'\n')
+            if cut < 0:
+                continue
+            # Cut after a complete record: quotes must be balanced before the cut
+            # (counted with numpy, several times faster than bytes.count)
+            quotes = np.equal(np.frombuffer(text, dtype=np.uint8, count=cut), QUOTE,
+                              out=_reused_array(self._arrays, 'quotes', cut, bool))
+            if np.count_nonzero(quotes) % 2 == 0 or len(text) > MAX_REPAIR_CARRY:
+                block, self._carry = text[:cut], text[cut + 1:]
+                break
+
+        with stage('repair', self._times):
+            repaired = b''
+            if not self._header_done:
+                self._header_done = True
+                if block.startswith(UTF8_BOM):
+                    block = block[len(UTF8_BOM):]
+                header, _, block = block.partition(b'\n')
+                repaired = header.strip() + b'\n' if header or block else b''
+            if block:
+                repaired += repair_block(block, self._arrays)
+
+        self._buffer = self._buffer[self._offset:] + repaired
+        self._offset = 0
+        return True
+
+    def readline(self, size=-1):
+        while True:
+            end = self._buffer.find(b'\n', self._offset)
+            if end >= 0 or not self._fill():
+                break
+        end = len(self._buffer) if end < 0 else end + 1
+        if size is not None and 0 <= size < end - self._offset:
+            end = self._offset + size
+        line = self._buffer[self._offset:end]
+        self._offset = end
+        return line
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = [self._buffer[self._offset:]]
+            self._buffer, self._offset = b'', 0
+            while self._fill():
+                parts.append(self._buffer)
+                self._buffer = b''
+            return b''.join(parts)
+
+        while len(self._buffer) - self._offset < size and self._fill():
+            pass
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+
+@contextmanager
+def map_report(file):
+    """
+    Memory-map an open binary report, with the read position past its BOM
+
+    The repair then reads byte ranges straight from the page cache instead
+    of copying them through a file buffer. Files that cannot be mapped
+    (empty files, pipes, special files) are yielded as-is.
+
+    Args:
+        file: File object opened in binary mode
+    """
+    try:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, io.UnsupportedOperation):
+        yield file
+        return
+
+    try:
+        if data[:len(UTF8_BOM)] == UTF8_BOM:
+            data.seek(len(UTF8_BOM))
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            data.madvise(mmap.MADV_SEQUENTIAL)
+        yield data
+    finally:
+        data.close()
+
+
+@contextmanager
+def open_report(source, encoding='utf-8-sig', progress=None):
+    """
+    Open an Amazon CSV report and yield a repaired, file-like stream for pandas
+
+    The stream yields UTF-8 bytes. Local UTF-8 reports are memory-mapped and
+    repaired straight from their bytes; file-like sources (e.g. a Streamlit
+    upload) are read block by block, and other encodings are decoded and
+    re-encoded on the fly.
+
+    Args:
+        source: Path to the CSV file, or a binary file-like object (e.g. an upload)
+        encoding (str): Text encoding of the report
+        progress (Progress): Updated with the bytes read
+    """
+    utf8 = codecs.lookup(encoding).name in ('utf-8', 'utf-8-sig')
+    if isinstance(source, (str, os.PathLike)):
+        if utf8:
+            with open(source, 'rb') as file, map_report(file) as data:
+                yield RepairedCSVReader(data, progress=progress)
+        else:
+            with open(source, 'r', encoding=encoding, newline='') as file:
+                yield RepairedCSVReader(file, progress=progress)
+        return
+
+    if utf8:
+        yield RepairedCSVReader(source, progress=progress)
+        return
+
+    # Decode on the fly, and detach afterwards so the caller's file object
+    # is not closed with the wrapper
+    text = io.TextIOWrapper(source, encoding=encoding, newline='')
+    try:
+        yield RepairedCSVReader(text, progress=progress)
+    finally:
+        text.detach()
+
+
+# Column kinds of the schema layer
+CATEGORY = 'category'
+DATETIME = 'datetime'
+NUMBER = 'number'
+TEXT = 'text'
+
+# Known columns of Amazon payment reports, FR and EN exports (lower case).
+# Identifiers and postal codes stay text so Excel keeps leading zeros and
+# does not turn long numbers into scientific notation.
+AMAZON_COLUMN_KINDS = {
+    'date/heure': DATETIME, 'date/time': DATETIME,
+    'numéro de versement': TEXT, 'settlement id': TEXT,
+    'type': CATEGORY,
+    'numéro de la commande': TEXT, 'order id': TEXT,
+    'sku': TEXT, 'description': TEXT,
+    'quantité': NUMBER, 'quantity': NUMBER,
+    'marketplace': CATEGORY,
+    'traitement': CATEGORY, 'fulfillment': CATEGORY, 'fulfilment': CATEGORY,
+    "ville d'origine de la commande": CATEGORY, 'order city': CATEGORY,
+    "région d'origine de la commande": CATEGORY, 'order state': CATEGORY,
+    'code postal de la commande': TEXT, 'order postal': TEXT,
+    'modèle de perception des taxes': CATEGORY, 'tax collection model': CATEGORY,
+    'devise': CATEGORY, 'currency': CATEGORY,
+    'ventes de produits': NUMBER, 'product sales': NUMBER,
+    'taxes sur la vente des produits': NUMBER, 'product sales tax': NUMBER,
+    "crédits d'expédition": NUMBER, 'shipping credits': NUMBER,
+    "taxe sur les crédits d'expédition": NUMBER, 'shipping credits tax': NUMBER,
+    'crédits sur les emballages cadeaux': NUMBER, 'gift wrap credits': NUMBER,
+    'taxes sur les crédits cadeaux': NUMBER, 'giftwrap credits tax': NUMBER,
+    'rabais promotionnels': NUMBER, 'promotional rebates': NUMBER,
+    'taxes sur les rabais promotionnels': NUMBER, 'promotional rebates tax': NUMBER,
+    'taxe retenue sur le site de vente': NUMBER, 'marketplace withheld tax': NUMBER,
+    'frais de vente': NUMBER, 'selling fees': NUMBER,
+    'frais expédié par amazon': NUMBER, 'fba fees': NUMBER,
+    'autres frais de transaction': NUMBER, 'other transaction fees': NUMBER,
+    'autres': NUMBER, 'other': NUMBER,
+    'total': NUMBER,
+}
+
+# Rows parsed to infer the schema of a report
+SCHEMA_SAMPLE_ROWS = 1000
+
+# Undeclared text columns become categorical below this share of distinct values
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+NUMBER_PATTERN = re.compile(r'^[-+]?[\d\s\u00a0\u202f.,]*\d$')
+DECIMAL_COMMA_PATTERN = re.compile(r'\d,\d{1,2}$')
+DECIMAL_POINT_PATTERN = re.compile(r'\d\.\d{1,2}$')
+DATE_LIKE_PATTERN = re.compile(r'\d[/.-]\d')
+NUMBER_SPACES_PATTERN = r'[\s\u00a0\u202f]'
+THOUSANDS_POINT_PATTERN = r'\.(?=\d{3}(?:\D|$))'
+THOUSANDS_COMMA_PATTERN = r',(?=\d{3}(?:\D|$))'
+LEADING_ZERO_PATTERN = re.compile(r'^-?0\d')
+TIMEZONE_SUFFIX_PATTERN = r'\s+[A-Z]{2,5}$'
+DATETIME_FORMATS = [
+    '%d/%m/%Y %H:%M:%S',
+    '%d.%m.%Y %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%b %d, %Y %I:%M:%S %p',
+    '%d %b %Y %H:%M:%S',
+    '%d/%m/%Y',
+    '%Y-%m-%d',
+]
+
+# Fields read as missing values, the defaults of pandas.read_csv
+MISSING_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+def _strip_timezone(values):
+    # Excel has no time zones: drop the trailing abbreviation (UTC, PDT, CET...)
+    return values.str.replace(TIMEZONE_SUFFIX_PATTERN, '', regex=True)
+
+
+def _parse_datetime(value, fmt):
+    return datetime.strptime(re.sub(TIMEZONE_SUFFIX_PATTERN, '', value), fmt)
+
+
+def _datetime_format(values):
+    """Return the first known format that parses every value, or None"""
+    for fmt in DATETIME_FORMATS:
+        try:
+            for value in values:
+                _parse_datetime(value, fmt)
+        except ValueError:
+            continue
+        return fmt
+    return None
+
+
+def _infer_kind(values):
+    """Infer the kind of a column from its non-missing sample values (strings)"""
+    if not values:
+        return TEXT
+    if all(NUMBER_PATTERN.match(value) for value in values):
+        if any(LEADING_ZERO_PATTERN.match(value) for value in values):
+            return TEXT
+        return NUMBER
+    if len(set(values)) <= CATEGORY_MAX_UNIQUE_RATIO * len(values):
+        return CATEGORY
+    return TEXT
+
+
+class ReportSchema:
+    """
+    Per-column dtypes of a report: declared for known Amazon columns,
+    inferred from a sample for the others
+
+    Categories are read as pandas 'category', identifiers as text, amounts
+    and quantities are converted to numbers (decimal comma for FR reports)
+    and downcast when integral, and dates are parsed so Excel gets real
+    number and date cells.
+
+    Args:
+        kinds (dict): Column name -> CATEGORY, DATETIME, NUMBER or TEXT
+        decimal (str): Decimal separator of the amounts ('.' or ',')
+        date_formats (dict): Column name -> strptime format of DATETIME columns
+        columns (list): Columns to keep (all when None)
+    """
+
+    def __init__(self, kinds, decimal='.', date_formats=None, columns=None):
+        self.kinds = kinds
+        self.decimal = decimal
+        self.date_formats = date_formats or {}
+        self.columns = columns
+
+    def to_dict(self):
+        """JSON-serializable form of the schema (see from_dict)"""
+        return {'kinds': self.kinds, 'decimal': self.decimal,
+                'date_formats': self.date_formats, 'columns': self.columns}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def infer(cls, sample, columns=None):
+        """
+        Build a schema from a sample of the report, in pure Python
+
+        Args:
+            sample: First rows of the report as column name -> values (strings,
+                None or NaN when missing), e.g. from read_sample() or a
+                DataFrame read with dtype=str
+            columns (list): Columns to keep (all when None)
+        """
+        kinds, date_formats = {}, {}
+        decimal_comma = decimal_point = False
+        for column in sample:
+            values = [value.strip() for value in sample[column] if isinstance(value, str)]
+            values = [value for value in values if value]
+            declared = AMAZON_COLUMN_KINDS.get(str(column).strip().lower())
+            kind = declared or _infer_kind(values)
+
+            # Declared date columns, and undeclared ones that look like dates
+            looks_like_date = (declared is None and values
+                               and all(DATE_LIKE_PATTERN.search(value) for value in values))
+            if kind == DATETIME or looks_like_date:
+                fmt = _datetime_format(values) if values else None
+                if fmt:
+                    kind, date_formats[column] = DATETIME, fmt
+                elif kind == DATETIME:
+                    kind = TEXT
+            if kind == NUMBER and values:
+                if any(DECIMAL_COMMA_PATTERN.search(value) for value in values):
+                    decimal_comma = True
+                elif any(DECIMAL_POINT_PATTERN.search(value) for value in values):
+                    decimal_point = True
+            kinds[column] = kind
+
+        decimal = ',' if decimal_comma and not decimal_point else '.'
+        return cls(kinds, decimal=decimal, date_formats=date_formats, columns=columns)
+
+    def read_options(self):
+        """Keyword arguments for pd.read_csv (dtype= and usecols=)"""
+        dtype = {column: 'category' if kind == CATEGORY else str
+                 for column, kind in self.kinds.items()}
+        options = {'dtype': dtype}
+        if self.columns is not None:
+            options['usecols'] = self.columns
+        return options
+
+    def arrow_convert_options(self):
+        """pyarrow.csv.ConvertOptions equivalent of read_options()"""
+        column_types = {
+            column: pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) if kind == CATEGORY else pyarrow.string()
+            for column, kind in self.kinds.items()
+        }
+        return pyarrow.csv.ConvertOptions(column_types=column_types, include_columns=self.columns,
+                                          strings_can_be_null=True)
+
+    def _to_number(self, values):
+        text = values.astype(str).str.replace(NUMBER_SPACES_PATTERN, '', regex=True)
+        # Drop thousands separators only where they group three digits, so a
+        # separator of the other convention makes the conversion fail instead
+        # of silently changing the amount
+        if self.decimal == ',':
+            text = text.str.replace(THOUSANDS_POINT_PATTERN, '', regex=True).str.replace(',', '.', regex=False)
+        else:
+            text = text.str.replace(THOUSANDS_COMMA_PATTERN, '', regex=True)
+        numbers = pd.to_numeric(text.where(values.notna()))
+        if numbers.notna().all() and (numbers % 1 == 0).all():
+            return pd.to_numeric(numbers, downcast='integer')
+        # Amounts stay float64: float32 would turn cents into 0.10000000149
+        return numbers
+
+    def apply(self, df):
+        """Convert the number and date columns of a DataFrame read with read_options()"""
+        for column in df.columns:
+            kind = self.kinds.get(column)
+            try:
+                if kind == NUMBER:
+                    df[column] = self._to_number(df[column])
+                elif kind == DATETIME:
+                    df[column] = pd.to_datetime(_strip_timezone(df[column]),
+                                                format=self.date_formats.get(column))
+            except (ValueError, TypeError):
+                # Unexpected value later in the report: keep the column as text
+                pass
+        return df
+
+    def _parse_number(self, value):
+        # Same normalization as _to_number, one value at a time
+        if self.decimal == '.' or '.' not in value:
+            try:
+                # Most amounts have no separator but the decimal one
+                return float(value.replace(',', '.') if self.decimal == ',' else value)
+            except ValueError:
+                pass
+        text = re.sub(NUMBER_SPACES_PATTERN, '', value)
+        if self.decimal == ',':
+            text = re.sub(THOUSANDS_POINT_PATTERN, '', text).replace(',', '.')
+        else:
+            text = re.sub(THOUSANDS_COMMA_PATTERN, '', text)
+        return float(text)
+
+    def apply_rows(self, columns, rows):
+        """
+        Pure-Python apply(): convert the number and date columns of records
+        read with iter_records(), in place
+
+        Args:
+            columns (list): Column names
+            rows (list): Records, lists of strings (None when missing)
+
+        Returns:
+            tuple: (columns, rows), restricted to the schema's columns if set
+        """
+        if self.columns is not None:
+            indexes = [columns.index(column) for column in self.columns]
+            columns = list(self.columns)
+            rows = [[row[index] for index in indexes] for row in rows]
+        for index, column in enumerate(columns):
+            kind = self.kinds.get(column)
+            values = [row[index] for row in rows]
+            try:
+                if kind == NUMBER:
+                    values = [None if value is None else self._parse_number(value) for value in values]
+                    if all(value is not None and value % 1 == 0 for value in values):
+                        values = [int(value) for value in values]
+                elif kind == DATETIME:
+                    fmt = self.date_formats.get(column)
+                    values = [None if value is None else _parse_datetime(value, fmt) for value in values]
+                else:
+                    continue
+            except (ValueError, TypeError):
+                # Unexpected value later in the report: keep the column as text
+                continue
+            for row, value in zip(rows, values):
+                row[index] = value
+        return columns, rows
+
+
+def _column_names(header):
+    """Column names as pandas reads them: 'Unnamed: i' when blank, '.1', '.2'... on duplicates"""
+    names, seen = [], {}
+    for index, name in enumerate(header):
+        name = name or f'Unnamed: {index}'
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f'{name}.{count}' if count else name)
+    return names
+
+
+def iter_records(report):
+    """
+    Parse a repaired report stream (see open_report) with the csv module, without pandas
+
+    Yields the column names first, then each record as a list of strings
+    with None for missing values, padded or cut to the header's width, as
+    pandas would read it with dtype=str.
+    """
+    reader = csv.reader(codecs.iterdecode(report, 'utf-8'))
+    header = next(reader, None)
+    if not header:
+        raise ValueError("No columns to parse from file")
+    names = _column_names(header)
+    yield names
+    width = len(names)
+    for record in reader:
+        if not record:
+            # Blank line
+            continue
+        record = [None if field in MISSING_VALUES else field for field in record[:width]]
+        if len(record) < width:
+            record.extend([None] * (width - len(record)))
+        yield record
+
+
+def read_sample(source, nrows=SCHEMA_SAMPLE_ROWS, columns=None):
+    """
+    First rows of a report as column name -> list of values (strings, None
+    when missing), read with the csv module
+
+    File-like sources are rewound to their original position afterwards.
+    """
+    position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    try:
+        with open_report(source) as report:
+            records = iter_records(report)
+            names = next(records)
+            rows = list(itertools.islice(records, nrows))
+    finally:
+        if position is not None:
+            source.seek(position)
+    sample = {name: [row[index] for row in rows] for index, name in enumerate(names)}
+    if columns is not None:
+        sample = {column: sample[column] for column in columns}
+    return sample
+
+
+def infer_schema(source, columns=None, sample_rows=SCHEMA_SAMPLE_ROWS):
+    """
+    Infer the schema of a report from its first rows
+
+    The sample is read with the csv module, so inferring a schema does not
+    import pandas. File-like sources are rewound to their original position
+    afterwards.
+    """
+    with stage('infer_schema'):
+        return ReportSchema.infer(read_sample(source, sample_rows, columns), columns=columns)
+
+
+def resolve_schema(source, schema='auto'):
+    """Turn a schema argument ('auto', None or a ReportSchema) into a ReportSchema or None"""
+    if schema == 'auto':
+        return infer_schema(source)
+    return schema
+
+
+READ_ENGINE_CHOICES = ['auto', 'c', 'pyarrow']
+
+
+def get_read_engine(read_engine='auto'):
+    """
+    Resolve a CSV parser name: 'c' (pandas) or 'pyarrow'
+
+    'auto' picks pyarrow when it is installed and falls back to pandas' C parser.
+    """
+    if read_engine == 'auto':
+        return 'pyarrow' if pyarrow is not None else 'c'
+    if read_engine not in READ_ENGINE_CHOICES:
+        raise ValueError(f"Unknown read engine: {read_engine} (choose from {', '.join(READ_ENGINE_CHOICES)})")
+    if read_engine == 'pyarrow' and pyarrow is None:
+        raise ValueError("The pyarrow read engine requires pyarrow (pip install pyarrow)")
+    return read_engine
+
+
+def parse_repaired(report, schema=None, read_engine='c', **read_kwargs):
+    """
+    Parse a repaired report stream (see open_report) into a DataFrame
+
+    With pyarrow, the report is parsed on several threads and text columns
+    become Arrow strings, which take far less memory than Python str
+    objects for the description and SKU columns. pandas' C parser is used
+    whenever extra read_csv arguments are given (nrows...).
+
+    Args:
+        report: Repaired, binary file-like stream
+        schema: A ReportSchema, or None for the parser's own type inference
+        read_engine (str): 'c' or 'pyarrow' (already resolved)
+        **read_kwargs: Extra pd.read_csv arguments
+    """
+    with stage('parse'):
+        if read_engine == 'pyarrow' and not read_kwargs:
+            convert_options = (schema.arrow_convert_options() if schema is not None
+                               else pyarrow.csv.ConvertOptions(strings_can_be_null=True))
+            table = pyarrow.csv.read_csv(report, convert_options=convert_options)
+            df = table.to_pandas(types_mapper={pyarrow.string(): pd.StringDtype('pyarrow')}.get)
+        else:
+            options = schema.read_options() if schema is not None else {}
+            options.update(read_kwargs)
+            df = pd.read_csv(report, sep=',', **options)
+    if schema is None:
+        return df
+    with stage('dtype_cast'):
+        return schema.apply(df)
+
+
+def read_report(source, schema='auto', read_engine='auto', progress=None, **read_kwargs):
+    """
+    Parse a whole report into a DataFrame with the quote repair and the schema
+
+    Args:
+        source: Path to the CSV file, or a binary file-like object
+        schema: 'auto' to infer dtypes, a ReportSchema, or None for pandas defaults
+        read_engine (str): CSV parser ('auto', 'c' or 'pyarrow')
+        progress (Progress): Updated with the bytes read and rows parsed
+        **read_kwargs: Extra pd.read_csv arguments (nrows...)
+    """
+    read_engine = get_read_engine(read_engine)
+    schema = resolve_schema(source, schema)
+    with open_report(source, progress=progress) as report:
+        df = parse_repaired(report, schema, read_engine, **read_kwargs)
+    if progress is not None:
+        progress.update(rows_parsed=len(df))
+    return df
+
+
+def iter_report(source, chunk_size=None, schema='auto', progress=None):
+    """
+    Parse a report chunk by chunk, yielding DataFrames of chunk_size rows
+
+    The schema is inferred once, so every chunk gets the same dtypes.
+    """
+    schema = resolve_schema(source, schema)
+    options = schema.read_options() if schema is not None else {}
+    with open_report(source, progress=progress) as report:
+        with stage('parse'):
+            chunks = pd.read_csv(report, sep=',', chunksize=chunk_size, **options)
+        while True:
+            # Timed around each chunk, not across the yield
+            with stage('parse'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            if progress is not None:
+                progress.update(rows_parsed=len(chunk))
+            if schema is not None:
+                with stage('dtype_cast'):
+                    chunk = schema.apply(chunk)
+            yield chunk
+
+
+# Block size of the byte-level newline scan
+NEWLINE_SCAN_BLOCK = 1024 * 1024
+
+
+def preview_report(source, nrows=5, schema='auto'):
+    """
+    Parse only the first rows of a report, with the same quote repair and
+    dtypes as a conversion
+
+    Args:
+        source: Path to the CSV file, or a binary file-like object
+        nrows (int): Number of data rows to parse
+        schema: 'auto' to infer dtypes, a ReportSchema, or None for pandas defaults
+    """
+    return read_report(source, schema=schema, nrows=nrows)
+
+
+def count_rows(source):
+    """
+    Count the data rows of a report with a byte-level newline scan, without parsing
+
+    Quoted fields spanning several lines are counted once per line. File-like
+    sources are rewound to their original position afterwards.
+
+    Args:
+        source: Path to the CSV file, or a binary file-like object
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            return count_rows(file)
+
+    position = source.tell()
+    source.seek(0)
+    lines = 0
+    last_block = b''
+    try:
+        while True:
+            block = source.read(NEWLINE_SCAN_BLOCK)
+            if not block:
+                break
+            lines += block.count(b'\n')
+            last_block = block
+    finally:
+        source.seek(position)
+
+    # A last line without a trailing newline still counts; the header does not
+    if last_block and not last_block.endswith(b'\n'):
+        lines += 1
+    return max(lines - 1, 0)
+
+
+# Excel column widths are capped so long descriptions stay readable
+MAX_COLUMN_WIDTH = 50
+
+# Rows converted to Python values at a time when writing a DataFrame
+WRITE_BATCH_ROWS = 10000
+
+
+def column_widths(df, max_width=MAX_COLUMN_WIDTH):
+    """
+    Compute Excel column widths from the data, one vectorized pass per column
+
+    Args:
+        df (DataFrame): Data to be written
+        max_width (int): Upper bound for a column width
+
+    Returns:
+        list: Width of each column, in the order of df.columns
+    """
+    widths = []
+    for column in df.columns:
+        lengths = df[column].dropna().astype(str).str.len()
+        longest = max(len(str(column)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(min(longest + 2, max_width))
+    return widths
+
+
+def row_widths(columns, rows, max_width=MAX_COLUMN_WIDTH):
+    """column_widths() of rows of Python values (None for missing)"""
+    widths = []
+    for index, column in enumerate(columns):
+        values = [row[index] for row in rows if row[index] is not None]
+        # Like pandas, dates all at midnight are shown without their time
+        if values and all(isinstance(value, datetime) and value == datetime(value.year, value.month, value.day)
+                          for value in values):
+            values = [value.date() for value in values]
+        longest = max((len(str(value)) for value in values), default=0)
+        widths.append(min(max(len(str(column)), longest) + 2, max_width))
+    return widths
+
+
+def iter_rows(df, batch_rows=WRITE_BATCH_ROWS):
+    """
+    Yield the rows of a DataFrame as tuples of Python values, None for missing
+
+    Rows are converted a batch at a time so a large DataFrame is never
+    copied to object dtype as a whole.
+    """
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows].astype(object)
+        batch = batch.where(batch.notna(), None)
+        yield from batch.itertuples(index=False, name=None)
+
+
+# Rows of an Excel worksheet, header included
+EXCEL_MAX_ROWS = 1048576
+
+# Excel limits sheet names to 31 characters and forbids []:*?/\
+MAX_SHEET_NAME_LENGTH = 31
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+class ExcelSheet:
+    """
+    One worksheet being written, whole or chunk by chunk, with auto-sized columns
+
+    Column widths are a running maximum over everything written. Backends
+    that must emit widths up front use the widths of the first DataFrame.
+    Past Excel's row limit, rows roll over to additional worksheets named
+    "<name> (2)", "<name> (3)"... each with its own header.
+    """
+
+    def __init__(self, backend, worksheet, name):
+        self.backend = backend
+        self.worksheet = worksheet
+        self.worksheets = [worksheet]
+        self.name = name
+        self.columns = None
+        self.widths = None
+        self.rows_written = 0
+        # Data rows in the current worksheet
+        self.worksheet_rows = 0
+
+    def write(self, df):
+        """Append a DataFrame (or a chunk of one) to the worksheet"""
+        with stage('column_sizing'):
+            widths = column_widths(df)
+        self._write(df.columns, widths, iter_rows(df), len(df))
+
+    def write_rows(self, columns, rows):
+        """Append a list of rows of Python values (None for missing), without pandas"""
+        with stage('column_sizing'):
+            widths = row_widths(columns, rows)
+        self._write(columns, widths, iter(rows), len(rows))
+
+    def _write(self, columns, widths, rows, count):
+        if self.columns is None:
+            self.columns = [str(column) for column in columns]
+            self.widths = widths
+            self.backend._start(self)
+        else:
+            self.widths = [max(old, new) for old, new in zip(self.widths, widths)]
+
+        # Rows are appended a batch at a time, so progress is reported between batches
+        while count > 0:
+            if self.worksheet_rows == EXCEL_MAX_ROWS - 1:
+                self._roll_over()
+            part = min(count, EXCEL_MAX_ROWS - 1 - self.worksheet_rows, WRITE_BATCH_ROWS)
+            with stage('write'):
+                self.backend._append(self, itertools.islice(rows, part))
+            self.worksheet_rows += part
+            self.rows_written += part
+            count -= part
+            if self.backend.progress is not None:
+                self.backend.progress.update(rows_written=part)
+
+    def _roll_over(self):
+        """Continue the sheet on a new worksheet, with the same header"""
+        suffix = f" ({len(self.worksheets) + 1})"
+        name = self.name[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        self.worksheet = self.backend._create_worksheet(name)
+        self.worksheets.append(self.worksheet)
+        self.worksheet_rows = 0
+        self.backend._start(self)
+
+
+class ReportWriter:
+    """
+    Streaming writer of one output format: DataFrames are appended chunk by
+    chunk, and the output is finalized by close() (or on leaving a with block
+    without an exception). On an exception, or if closing fails, abort()
+    releases the output and removes what was written of it.
+
+    Set progress to a Progress to have the rows written reported to it.
+    """
+    name = None
+    progress = None
+    closing = False
+
+    def write(self, df):
+        """Append a DataFrame (or a chunk of one)"""
+        raise NotImplementedError
+
+    def write_rows(self, columns, rows):
+        """Append a list of rows of Python values, without pandas (xlsx only)"""
+        raise NotImplementedError(f"The {self.name} output cannot be written without pandas")
+
+    @property
+    def rows_written(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def abort(self):
+        """Release the output after a failure, removing what was written of it"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+            return
+        self.closing = True
+        try:
+            # Closing assembles the xlsx archive or the Parquet footer
+            with stage('write'):
+                self.close()
+        except BaseException:
+            self.abort()
+            raise
+
+
+class ExcelBackend(ReportWriter):
+    """
+    Streaming Excel workbook with one or more sheets
+
+    Sheets can be written in any interleaving; rows of each sheet are
+    appended in order.
+
+    Args:
+        excel_file: Path or binary file-like object of the output workbook
+        sheet_name (str): Name of the first worksheet (None to add sheets later)
+    """
+    name = None
+
+    def __init__(self, excel_file, sheet_name='Amazon Data'):
+        self.excel_file = excel_file
+        self.sheets = []
+        self.sheet = self.add_sheet(sheet_name) if sheet_name is not None else None
+
+    def add_sheet(self, sheet_name):
+        """Create a new worksheet and return its ExcelSheet"""
+        sheet = ExcelSheet(self, self._create_worksheet(sheet_name), sheet_name)
+        self.sheets.append(sheet)
+        return sheet
+
+    def write(self, df):
+        """Append a DataFrame (or a chunk of one) to the first worksheet"""
+        self.sheet.write(df)
+
+    def write_rows(self, columns, rows):
+        self.sheet.write_rows(columns, rows)
+
+    @property
+    def rows_written(self):
+        return self.sheet.rows_written
+
+    def close(self):
+        """Apply the final column widths and save the workbook"""
+        raise NotImplementedError
+
+    def abort(self):
+        # The workbook reaches its path only when it is saved
+        if self.closing and isinstance(self.excel_file, (str, os.PathLike)) and os.path.exists(self.excel_file):
+            os.remove(self.excel_file)
+
+    def _create_worksheet(self, sheet_name):
+        raise NotImplementedError
+
+    def _start(self, sheet):
+        raise NotImplementedError
+
+    def _append(self, sheet, rows):
+        raise NotImplementedError
+
+
+class OpenpyxlBackend(ExcelBackend):
+    """
+    openpyxl write-only workbook; always available, used as the fallback
+    """
+    name = 'openpyxl'
+
+    def __init__(self, excel_file, sheet_name='Amazon Data'):
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.header_font = openpyxl.styles.Font(bold=True)
+        super().__init__(excel_file, sheet_name)
+
+    def _create_worksheet(self, sheet_name):
+        return self.workbook.create_sheet(sheet_name)
+
+    def _start(self, sheet):
+        # Write-only sheets need their widths before the first row
+        for index, width in enumerate(sheet.widths, start=1):
+            sheet.worksheet.column_dimensions[openpyxl.utils.get_column_letter(index)].width = width
+        header = []
+        for column in sheet.columns:
+            cell = openpyxl.cell.WriteOnlyCell(sheet.worksheet, value=column)
+            cell.font = self.header_font
+            header.append(cell)
+        sheet.worksheet.append(header)
+
+    def _append(self, sheet, rows):
+        for row in rows:
+            sheet.worksheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.excel_file)
+
+
+class XlsxWriterBackend(ExcelBackend):
+    """
+    xlsxwriter in constant_memory mode: rows are flushed to disk as they are
+    written and widths are applied when the workbook is closed
+    """
+    name = 'xlsxwriter'
+
+    def __init__(self, excel_file, sheet_name='Amazon Data'):
+        if xlsxwriter is None:
+            raise ImportError("The xlsxwriter engine requires the 'xlsxwriter' package")
+        self.workbook = xlsxwriter.Workbook(excel_file, {
+            'constant_memory': True,
+            'nan_inf_to_errors': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        self.header_format = self.workbook.add_format({'bold': True})
+        super().__init__(excel_file, sheet_name)
+
+    def _create_worksheet(self, sheet_name):
+        return self.workbook.add_worksheet(sheet_name)
+
+    def _start(self, sheet):
+        sheet.worksheet.write_row(0, 0, sheet.columns, self.header_format)
+
+    def _append(self, sheet, rows):
+        # Row 0 is the header
+        write_row = sheet.worksheet.write_row
+        for row_index, row in enumerate(rows, start=sheet.worksheet_rows + 1):
+            write_row(row_index, 0, row)
+
+    def close(self):
+        for sheet in self.sheets:
+            for worksheet in sheet.worksheets:
+                for index, width in enumerate(sheet.widths or []):
+                    worksheet.set_column(index, index, width)
+        self.workbook.close()
+
+
+EXCEL_BACKENDS = {
+    OpenpyxlBackend.name: OpenpyxlBackend,
+    XlsxWriterBackend.name: XlsxWriterBackend,
+}
+ENGINE_CHOICES = ['auto'] + list(EXCEL_BACKENDS)
+
+
+def get_backend(engine='auto'):
+    """
+    Resolve an engine name to an Excel backend class
+
+    'auto' picks xlsxwriter when it is installed and falls back to openpyxl.
+    """
+    if engine == 'auto':
+        engine = XlsxWriterBackend.name if xlsxwriter is not None else OpenpyxlBackend.name
+    try:
+        return EXCEL_BACKENDS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown Excel engine: {engine} (choose from {', '.join(ENGINE_CHOICES)})")
+
+
+def write_excel(df, excel_file, sheet_name='Amazon Data', engine='auto', progress=None):
+    """
+    Write a DataFrame to a single Excel sheet with auto-sized columns
+
+    Widths are computed from the DataFrame while it is written, so the
+    worksheet is never traversed again afterwards.
+
+    Args:
+        df (DataFrame): Data to write
+        excel_file: Path or binary file-like object of the output workbook
+        sheet_name (str): Name of the worksheet
+        engine (str): Excel backend ('auto', 'openpyxl' or 'xlsxwriter')
+        progress (Progress): Updated with the rows written, a batch at a time
+    """
+    with get_backend(engine)(excel_file, sheet_name) as backend:
+        backend.progress = progress
+        backend.write(df)
+
+
+# Compression of the columnar outputs
+PARQUET_COMPRESSION = 'zstd'
+FEATHER_COMPRESSION = 'zstd'
+
+
+def _stable_arrow_type(arrow_type, numbers=True):
+    """
+    Widen an Arrow type inferred from one chunk so later chunks fit it
+
+    Numbers are typed per chunk: a column of whole amounts in one chunk is
+    downcast to integers and may hold decimals in the next, so number
+    columns are float64 once a report spans several chunks. Categories get
+    their own dictionary per chunk, and an all-empty text column has no
+    type at all.
+
+    Args:
+        arrow_type: Type inferred from the first chunk
+        numbers (bool): Widen numbers to float64 (False when the table is
+            the whole report)
+    """
+    if numbers and (pyarrow.types.is_integer(arrow_type) or pyarrow.types.is_floating(arrow_type)):
+        return pyarrow.float64()
+    if pyarrow.types.is_null(arrow_type) or pyarrow.types.is_large_string(arrow_type):
+        return pyarrow.string()
+    if pyarrow.types.is_dictionary(arrow_type):
+        return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    return arrow_type
+
+
+class ArrowWriter(ReportWriter):
+    """
+    Base of the columnar outputs: each DataFrame becomes an Arrow table cast
+    to the schema of the first one (with widened types), so all chunks of a
+    report share one file schema.
+
+    The first table is held until the second one arrives: a report written
+    in one piece keeps its inferred integer columns, number columns are only
+    widened to float64 when more chunks follow.
+
+    Columnar files cannot grow in place: in append mode the existing batches
+    are copied to a new file (their numbers widened like those of a report
+    in several chunks), which replaces the old one on close.
+
+    Args:
+        output_file: Path or binary file-like object of the output
+        sheet_name (str): Unused, for a common signature with ExcelBackend
+        append (bool): Add rows after those of an existing output file (path only)
+    """
+
+    def __init__(self, output_file, sheet_name=None, append=False):
+        if pyarrow is None:
+            raise ImportError(f"The {self.name} output requires the 'pyarrow' package")
+        self.output_file = output_file
+        self.schema = None
+        self.writer = None
+        self.replaces = None
+        self._first_table = None
+        self._rows_written = 0
+        if append:
+            self.replaces, self.output_file = output_file, f"{output_file}.partial"
+            try:
+                self._copy_existing(output_file)
+            except BaseException:
+                self.abort()
+                raise
+
+    @property
+    def rows_written(self):
+        return self._rows_written
+
+    def _schema_for(self, schema, numbers=True):
+        return pyarrow.schema([field.with_type(_stable_arrow_type(field.type, numbers)) for field in schema])
+
+    def write(self, df):
+        with stage('write'):
+            table = pyarrow.Table.from_pandas(df, preserve_index=False)
+            if self.writer is None and self._first_table is None:
+                self._first_table = table
+            else:
+                if self.writer is None:
+                    self._write_first_table(numbers=True)
+                self._write_table(table)
+        self._rows_written += len(df)
+        if self.progress is not None:
+            self.progress.update(rows_written=len(df))
+
+    def _write_first_table(self, numbers):
+        table, self._first_table = self._first_table, None
+        self.schema = self._schema_for(table.schema, numbers)
+        self.writer = self._open(self.schema)
+        self._write_table(table)
+
+    def _write_table(self, table):
+        try:
+            table = table.cast(self.schema)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError, ValueError) as e:
+            raise ValueError(f"Chunk does not match the {self.name} schema of the first chunk "
+                             f"(convert without streaming, or with a larger chunk size): {e}")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self._first_table is not None:
+            # The whole report in one table: no later chunk to widen the numbers for
+            self._write_first_table(numbers=False)
+        if self.writer is None:
+            # Nothing written: still produce a valid, empty file
+            self.schema = pyarrow.schema([])
+            self.writer = self._open(self.schema)
+        self.writer.close()
+        if self.replaces is not None:
+            os.replace(self.output_file, self.replaces)
+
+    def abort(self):
+        if self.writer is None:
+            return
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+        # The new file, or the copy that would have replaced the existing one
+        if isinstance(self.output_file, (str, os.PathLike)) and os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+    def _open(self, schema):
+        raise NotImplementedError
+
+    def _copy_existing(self, path):
+        """Open the writer with the schema of an existing file and copy its rows"""
+        raise NotImplementedError
+
+
+class ParquetWriter(ArrowWriter):
+    """Parquet file, one row group per chunk, compressed"""
+    name = 'parquet'
+
+    def _open(self, schema):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(self.output_file, schema, compression=PARQUET_COMPRESSION)
+
+    def _copy_existing(self, path):
+        import pyarrow.parquet
+        with pyarrow.parquet.ParquetFile(path) as existing:
+            self.schema = self._schema_for(existing.schema_arrow)
+            self.writer = self._open(self.schema)
+            for batch in existing.iter_batches():
+                self._write_table(pyarrow.Table.from_batches([batch]))
+
+
+class FeatherWriter(ArrowWriter):
+    """
+    Feather (Arrow IPC file), one record batch per chunk, compressed
+
+    Categories are stored as plain strings: the IPC file format cannot
+    change dictionaries between batches.
+    """
+    name = 'feather'
+
+    def _schema_for(self, schema, numbers=True):
+        schema = super()._schema_for(schema, numbers)
+        return pyarrow.schema([
+            field.with_type(pyarrow.string()) if pyarrow.types.is_dictionary(field.type) else field
+            for field in schema
+        ])
+
+    def _open(self, schema):
+        options = pyarrow.ipc.IpcWriteOptions(compression=FEATHER_COMPRESSION)
+        return pyarrow.ipc.new_file(self.output_file, schema, options=options)
+
+    def _copy_existing(self, path):
+        with pyarrow.memory_map(path) as source:
+            existing = pyarrow.ipc.open_file(source)
+            self.schema = self._schema_for(existing.schema)
+            self.writer = self._open(self.schema)
+            for index in range(existing.num_record_batches):
+                self._write_table(pyarrow.Table.from_batches([existing.get_batch(index)]))
+
+
+class CleanCSVWriter(ReportWriter):
+    """
+    Repaired report as plain RFC 4180 CSV: UTF-8, comma separated, fields
+    quoted only when needed, CRLF line endings, dates in ISO format
+
+    Args:
+        output_file: Path or binary file-like object of the output
+        sheet_name (str): Unused, for a common signature with ExcelBackend
+        append (bool): Add rows at the end of an existing output file (path only)
+    """
+    name = 'csv'
+
+    def __init__(self, output_file, sheet_name=None, append=False):
+        self.output_file = output_file
+        if isinstance(output_file, (str, os.PathLike)):
+            self.file = open(output_file, 'a' if append else 'w', encoding='utf-8', newline='')
+            self._owned = True
+            # Appended rows are cut off again if the conversion fails
+            self.append_offset = os.path.getsize(output_file) if append else None
+        else:
+            self.file = io.TextIOWrapper(output_file, encoding='utf-8', newline='')
+            self._owned = False
+        self.header_written = append
+        self._rows_written = 0
+
+    @property
+    def rows_written(self):
+        return self._rows_written
+
+    def write(self, df):
+        with stage('write'):
+            df.to_csv(self.file, header=not self.header_written, index=False, lineterminator='\r\n')
+        self.header_written = True
+        self._rows_written += len(df)
+        if self.progress is not None:
+            self.progress.update(rows_written=len(df))
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+        else:
+            # Leave the caller's file object open
+            self.file.flush()
+            self.file.detach()
+
+    def abort(self):
+        if not self._owned:
+            self.close()
+            return
+        self.file.close()
+        if self.append_offset is None:
+            os.remove(self.output_file)
+        else:
+            os.truncate(self.output_file, self.append_offset)
+
+
+OUTPUT_WRITERS = {
+    'xlsx': None,  # Excel backend chosen by engine, see get_backend()
+    ParquetWriter.name: ParquetWriter,
+    FeatherWriter.name: FeatherWriter,
+    CleanCSVWriter.name: CleanCSVWriter,
+}
+FORMAT_CHOICES = ['auto'] + list(OUTPUT_WRITERS)
+
+# Default file name ending of each format (clean CSVs must not overwrite their input)
+OUTPUT_SUFFIXES = {'xlsx': '.xlsx', 'parquet': '.parquet', 'feather': '.feather', 'csv': '_clean.csv'}
+FORMAT_EXTENSIONS = {'.xlsx': 'xlsx', '.parquet': 'parquet', '.pq': 'parquet',
+                     '.feather': 'feather', '.arrow': 'feather', '.csv': 'csv'}
+
+
+def output_format_for(output_path, output_format='auto'):
+    """
+    Resolve 'auto' to the format matching the output file extension (xlsx by default)
+
+    Raises:
+        ValueError: Unknown format, or an explicit format written to a file
+            whose extension is that of another format (out.xlsx as parquet)
+    """
+    extension_format = None
+    if isinstance(output_path, (str, os.PathLike)):
+        extension_format = FORMAT_EXTENSIONS.get(os.path.splitext(output_path)[1].lower())
+    if output_format == 'auto':
+        return extension_format or 'xlsx'
+    if output_format not in OUTPUT_WRITERS:
+        raise ValueError(f"Unknown output format: {output_format} (choose from {', '.join(FORMAT_CHOICES)})")
+    if extension_format is not None and extension_format != output_format:
+        raise ValueError(f"Cannot write {output_format} to {os.fspath(output_path)}: "
+                         f"its extension is that of {extension_format} files")
+    return output_format
+
+
+def get_writer(output_format='xlsx', engine='auto'):
+    """
+    Resolve an output format to a ReportWriter class, called as
+    writer_class(output_file, sheet_name)
+
+    Args:
+        output_format (str): 'xlsx', 'parquet', 'feather' or 'csv'
+        engine (str): Excel backend for xlsx ('auto', 'openpyxl' or 'xlsxwriter')
+    """
+    if output_format == 'xlsx':
+        return get_backend(engine)
+    try:
+        return OUTPUT_WRITERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown output format: {output_format} (choose from {', '.join(FORMAT_CHOICES)})")
+
+
+# Summary sheets, aggregated in the same pass as the conversion
+
+@dataclass
+class Summary:
+    """
+    Aggregate sheet written next to the data: per value of a key column,
+    the row count and the sums of the number columns, or with pivot_keys a
+    pivot table of one value column
+
+    Column names are matched case-insensitively, so one Summary covers the
+    FR and EN exports. A summary whose columns are missing is skipped.
+
+    Args:
+        sheet_name (str): Name of the worksheet
+        keys (list): Candidate names of the key column, the first present is used
+        by_day (bool): Group a date key by calendar day
+        values (list): Candidate names of the summed columns (default: every number column)
+        pivot_keys (list): Candidate names of the column spread across the sheet
+    """
+    sheet_name: str
+    keys: list
+    by_day: bool = False
+    values: list = None
+    pivot_keys: list = None
+
+
+DATE_COLUMNS = ['date/heure', 'date/time']
+
+SUMMARIES = {
+    'sku': Summary('By SKU', ['sku']),
+    'day': Summary('By Day', DATE_COLUMNS, by_day=True),
+    'marketplace': Summary('By Marketplace', ['marketplace']),
+    # Transaction and fee types: order, refund, service fee, FBA inventory fee...
+    'type': Summary('By Type', ['type']),
+    'day_type': Summary('Total by Day and Type', DATE_COLUMNS, by_day=True, values=['total'],
+                        pivot_keys=['type']),
+}
+
+# Partial aggregates kept before being merged, in streaming and parallel modes
+SUMMARY_MERGE_EVERY = 8
+
+
+def resolve_summaries(summaries):
+    """
+    List of Summary from names of SUMMARIES ('all' for every one) and Summary objects
+
+    Raises:
+        ValueError: Unknown summary name
+    """
+    resolved = []
+    for summary in summaries or []:
+        if isinstance(summary, Summary):
+            resolved.append(summary)
+        elif summary == 'all':
+            resolved.extend(SUMMARIES.values())
+        elif summary in SUMMARIES:
+            resolved.append(SUMMARIES[summary])
+        else:
+            raise ValueError(f"Unknown summary: {summary} (choose from all, {', '.join(SUMMARIES)})")
+    return resolved
+
+
+def _find_column(columns, candidates):
+    """Name of the first candidate present in columns (case-insensitive), or None"""
+    names = {str(column).strip().lower(): column for column in columns}
+    return next((names[name] for name in candidates if name in names), None)
+
+
+class SummaryAggregator:
+    """
+    Computes summary sheets chunk by chunk, from the DataFrames being written
+
+    Each chunk is reduced with groupby to partial sums and row counts per
+    key, and the partials are merged by summing them again, so any chunking
+    of the report gives the same sheets as the whole DataFrame. Columns are
+    resolved on the first chunk.
+
+    Args:
+        summaries (list): Summary objects
+    """
+
+    def __init__(self, summaries):
+        self.summaries = summaries
+        # Per summary: (key, pivot, values) column names, or None if skipped
+        self.plans = None
+        self.partials = [[] for _ in summaries]
+
+    def _plan(self, df, summary):
+        key = _find_column(df.columns, summary.keys)
+        if key is None or (summary.by_day and not pd.api.types.is_datetime64_any_dtype(df[key])):
+            return None
+        pivot = _find_column(df.columns, summary.pivot_keys) if summary.pivot_keys else None
+        if summary.pivot_keys and pivot is None:
+            return None
+        if summary.values is not None:
+            values = [_find_column(df.columns, [name]) for name in summary.values]
+            values = [column for column in values if column is not None]
+        else:
+            values = [column for column in df.columns
+                      if column not in (key, pivot) and pd.api.types.is_numeric_dtype(df[column])
+                      and not pd.api.types.is_bool_dtype(df[column])]
+        if pivot is not None and not values:
+            return None
+        return key, pivot, values[:1] if pivot is not None else values
+
+    def add(self, df):
+        """Aggregate a DataFrame (or a chunk of one)"""
+        with stage('aggregate'):
+            if self.plans is None:
+                self.plans = [self._plan(df, summary) for summary in self.summaries]
+            for summary, plan, partials in zip(self.summaries, self.plans, self.partials):
+                if plan is None:
+                    continue
+                key, pivot, values = plan
+                keys = [df[key].dt.normalize() if summary.by_day else df[key]]
+                if pivot is not None:
+                    keys.append(df[pivot])
+                grouped = df[values].groupby(keys, observed=True, dropna=False, sort=False)
+                partial = grouped.sum()
+                if pivot is None:
+                    partial.insert(0, 'rows', grouped.size())
+                partials.append(partial)
+                if len(partials) >= SUMMARY_MERGE_EVERY:
+                    partials[:] = [self._merge(partials)]
+
+    @staticmethod
+    def _merge(partials):
+        merged = pd.concat(partials) if len(partials) > 1 else partials[0]
+        levels = list(range(merged.index.nlevels))
+        return merged.groupby(level=levels, observed=True, dropna=False, sort=False).sum()
+
+    @staticmethod
+    def _plain_keys(merged):
+        # Category keys sort by value, as merged chunks with different categories do
+        keys = merged.index.to_frame(index=False)
+        for column in keys.columns:
+            if isinstance(keys[column].dtype, pd.CategoricalDtype):
+                keys[column] = keys[column].astype(object)
+        merged.index = pd.MultiIndex.from_frame(keys) if len(keys.columns) > 1 else pd.Index(keys.iloc[:, 0])
+        return merged
+
+    def results(self):
+        """
+        Returns:
+            list: (sheet name, DataFrame) of each summary, sorted by key
+        """
+        results = []
+        with stage('aggregate'):
+            for summary, plan, partials in zip(self.summaries, self.plans or [], self.partials):
+                if plan is None or not partials:
+                    continue
+                key, pivot, values = plan
+                merged = self._plain_keys(self._merge(partials)).sort_index()
+                if pivot is not None:
+                    merged = merged[values[0]].unstack(fill_value=0)
+                    merged.columns = [str(column) for column in merged.columns]
+                results.append((summary.sheet_name, merged.round(2).reset_index()))
+        return results
+
+
+def write_summaries(writer, aggregator):
+    """Add the summary sheets of a SummaryAggregator to an xlsx writer, after its data"""
+    # Summary rows are not report rows: keep them out of the progress
+    progress, writer.progress = writer.progress, None
+    try:
+        for sheet_name, summary in aggregator.results():
+            writer.add_sheet(sheet_name).write(summary)
+    finally:
+        writer.progress = progress
+
+
+def check_summaries(summaries, output_format):
+    """Summary objects to compute for an output, raising if the format has no sheets"""
+    summaries = resolve_summaries(summaries)
+    if summaries and output_format != 'xlsx':
+        raise ValueError(f"Summary sheets need the xlsx output, not {output_format}")
+    return summaries
+
+
+# Reports above this size are converted in streaming mode by default
+STREAMING_THRESHOLD_BYTES = 100 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def should_stream(csv_file_path, threshold=STREAMING_THRESHOLD_BYTES):
+    """
+    Tell whether a report is large enough to be converted in streaming mode
+    """
+    return os.path.getsize(csv_file_path) > threshold
+
+
+def csv_to_excel_streaming(source, excel_file_path, sheet_name='Amazon Data',
+                           chunk_size=DEFAULT_CHUNK_SIZE, engine='auto', schema='auto',
+                           output_format='xlsx', progress=None, summaries=None, importer=None):
+    """
+    Convert an Amazon CSV report to Excel (or another format) with bounded memory
+
+    The repaired CSV is parsed chunk by chunk and each chunk is appended to a
+    streaming writer (openpyxl write-only or xlsxwriter constant_memory
+    workbook, Parquet row groups, Feather batches, CSV lines), so neither the
+    DataFrame nor the output ever holds the whole report in memory.
+    With openpyxl, column widths are sized from the header and first chunk.
+
+    Args:
+        source: Path to the CSV file, or a binary file-like object
+        excel_file_path: Path (or binary file-like object) of the output file
+        sheet_name (str): Name of the worksheet to create (xlsx)
+        chunk_size (int): Number of rows parsed per chunk
+        engine (str): Excel backend ('auto', 'openpyxl' or 'xlsxwriter')
+        schema: 'auto' to infer dtypes, a ReportSchema, or None for pandas defaults
+        output_format (str): 'xlsx', 'parquet', 'feather' or 'csv'
+        progress (Progress): Progress and cancel token, checked between chunks
+        summaries (list): Summary sheets added after the data, aggregated
+            from the chunks (xlsx)
+        importer (StoreImport): Also add the chunks to a report store
+
+    Returns:
+        int: Number of data rows written
+    """
+    aggregator = SummaryAggregator(summaries) if summaries else None
+    with get_writer(output_format, engine)(excel_file_path, sheet_name) as writer:
+        writer.progress = progress
+        for chunk in iter_report(source, chunk_size, schema=schema, progress=progress):
+            if aggregator is not None:
+                aggregator.add(chunk)
+            if importer is not None:
+                importer.add(chunk)
+            writer.write(chunk)
+        if aggregator is not None:
+            write_summaries(writer, aggregator)
+    return writer.rows_written
+
+
+# Reports up to this size are converted to xlsx without pandas by default
+FAST_PATH_MAX_BYTES = 1024 * 1024
+
+
+def use_fast_path(csv_file_path, threshold=FAST_PATH_MAX_BYTES):
+    """
+    Tell whether a report is small enough for the csv module fast path
+
+    Below this size, importing pandas takes longer than converting the
+    report in pure Python.
+    """
+    return os.path.getsize(csv_file_path) <= threshold
+
+
+def csv_to_excel_fast(source, excel_file_path, sheet_name='Amazon Data', engine='auto', schema='auto',
+                      progress=None):
+    """
+    Convert a small Amazon CSV report to Excel with the csv module, without pandas
+
+    The report is repaired, parsed with csv.reader and typed with the same
+    schema as the pandas path (ReportSchema.apply_rows), then written to the
+    workbook row by row. The whole report is held in memory as Python lists,
+    so this is only meant for small reports (see use_fast_path).
+
+    Args:
+        source: Path to the CSV file, or a binary file-like object
+        excel_file_path: Path (or binary file-like object) of the output workbook
+        sheet_name (str): Name of the worksheet to create
+        engine (str): Excel backend ('auto', 'openpyxl' or 'xlsxwriter')
+        schema: 'auto' to infer dtypes, or a ReportSchema
+        progress (Progress): Progress and cancel token, checked between batches
+
+    Returns:
+        int: Number of data rows written
+    """
+    schema = resolve_schema(source, schema)
+    with open_report(source, progress=progress) as report:
+        with stage('parse'):
+            records = iter_records(report)
+            columns = next(records)
+            rows = list(records)
+    if progress is not None:
+        progress.update(rows_parsed=len(rows))
+    with stage('dtype_cast'):
+        columns, rows = schema.apply_rows(columns, rows)
+    with get_backend(engine)(excel_file_path, sheet_name) as backend:
+        backend.progress = progress
+        backend.write_rows(columns, rows)
+    return backend.rows_written
+
+
+# Bytes of the report parsed by one task in parallel mode
+PARALLEL_CHUNK_BYTES = 32 * 1024 * 1024
+
+
+class ReportRange:
+    """
+    Binary file-like view of a report: its header line, then the bytes
+    [start, end) of its data, so a slice of the report parses on its own.
+    """
+
+    def __init__(self, data, header, start, end):
+        self._data = data
+        self._header = header
+        self._position = start
+        self._end = end
+
+    def read(self, size=-1):
+        if self._header:
+            header, self._header = self._header, b''
+            return header
+        remaining = self._end - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._data[self._position:self._position + size]
+        self._position += len(data)
+        return data
+
+
+def _record_boundary(data, start, target, size):
+    """First offset from target that ends a record, given records begin at start"""
+    quotes = data[start:target].count(b'"')
+    end = target
+    while end < size:
+        newline = data.find(b'\n', end)
+        if newline < 0:
+            break
+        quotes += data[end:newline].count(b'"')
+        end = newline + 1
+        # Balanced quotes: the newline is not inside a quoted field
+        if quotes % 2 == 0:
+            return end
+    return size
+
+
+def split_report(csv_file_path, chunk_bytes=PARALLEL_CHUNK_BYTES):
+    """
+    Split a local report into byte ranges that each hold whole records
+
+    Ranges are cut at newlines outside quoted fields, so a field with
+    embedded newlines is never split.
+
+    Args:
+        csv_file_path (str): Path to the CSV file
+        chunk_bytes (int): Approximate size of each range
+
+    Returns:
+        tuple: (header line as bytes, list of (start, end) offsets), or
+        (None, []) if the file cannot be memory-mapped (e.g. it is empty)
+    """
+    with open(csv_file_path, 'rb') as file, map_report(file) as data:
+        if not isinstance(data, mmap.mmap):
+            return None, []
+        header = data.readline()
+        start, size = data.tell(), len(data)
+        ranges = []
+        while start < size:
+            end = _record_boundary(data, start, min(start + chunk_bytes, size), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def parse_report_range(csv_file_path, header, start, end, schema=None, read_engine='c'):
+    """
+    Parse the records [start, end) of a report (worker of the parallel mode)
+
+    Args:
+        csv_file_path (str): Path to the CSV file
+        header (bytes): Header line of the report, shared by every range
+        start, end (int): Byte offsets from split_report
+        schema: A ReportSchema, or None for pandas defaults
+        read_engine (str): 'c' or 'pyarrow' (already resolved)
+
+    Returns:
+        pd.DataFrame: Parsed and typed records
+    """
+    with open(csv_file_path, 'rb') as file, map_report(file) as data:
+        report = RepairedCSVReader(ReportRange(data, header, start, end))
+        return parse_repaired(report, schema, read_engine)
+
+
+def csv_to_excel_parallel(csv_file_path, excel_file_path, sheet_name='Amazon Data', workers=None,
+                          chunk_bytes=PARALLEL_CHUNK_BYTES, engine='auto', schema='auto', read_engine='auto',
+                          output_format='xlsx', progress=None, summaries=None, importer=None):
+    """
+    Convert one large local report to Excel (or another format), parsing it on several cores
+
+    The report is split at record boundaries, the ranges are parsed in a
+    process pool with the header and schema of the whole report, and the
+    parsed chunks are streamed to the workbook in order. At most two chunks
+    per worker are in flight, so memory stays bounded as in streaming mode.
+
+    Args:
+        csv_file_path (str): Path to the input CSV file
+        excel_file_path: Path (or binary file-like object) of the output file
+        sheet_name (str): Name of the worksheet to create (xlsx)
+        workers (int): Number of parser processes (default: CPU count)
+        chunk_bytes (int): Bytes of the report parsed per task
+        engine (str): Excel backend ('auto', 'openpyxl' or 'xlsxwriter')
+        schema: 'auto' to infer dtypes, a ReportSchema, or None for pandas defaults
+        read_engine (str): CSV parser of each range ('auto', 'c' or 'pyarrow')
+        output_format (str): 'xlsx', 'parquet', 'feather' or 'csv'
+        progress (Progress): Progress and cancel token, checked between chunks
+        summaries (list): Summary sheets added after the data, aggregated
+            from the parsed chunks in this process (xlsx)
+        importer (StoreImport): Also add the parsed chunks to a report store
+
+    Returns:
+        int: Number of data rows written
+    """
+    read_engine = get_read_engine(read_engine)
+    header, ranges = split_report(csv_file_path, chunk_bytes)
+    if header is None:
+        # Nothing to split: convert it in this process
+        return csv_to_excel_streaming(csv_file_path, excel_file_path, sheet_name,
+                                      engine=engine, schema=schema, output_format=output_format,
+                                      progress=progress, summaries=summaries, importer=importer)
+    schema = resolve_schema(csv_file_path, schema)
+    workers = workers or os.cpu_count() or 1
+    aggregator = SummaryAggregator(summaries) if summaries else None
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            get_writer(output_format, engine)(excel_file_path, sheet_name) as writer:
+        writer.progress = progress
+        ranges = iter(ranges)
+        pending = deque()
+
+        def submit_next():
+            next_range = next(ranges, None)
+            if next_range is not None:
+                future = executor.submit(parse_report_range, csv_file_path, header,
+                                         *next_range, schema, read_engine)
+                pending.append((future, next_range[1] - next_range[0]))
+
+        for _ in range(2 * workers):
+            submit_next()
+        try:
+            while pending:
+                future, range_bytes = pending.popleft()
+                # Waiting for the parser processes
+                with stage('parse'):
+                    chunk = future.result()
+                if progress is not None:
+                    progress.update(bytes_read=range_bytes, rows_parsed=len(chunk))
+                submit_next()
+                if aggregator is not None:
+                    aggregator.add(chunk)
+                if importer is not None:
+                    importer.add(chunk)
+                writer.write(chunk)
+        except ConversionCancelled:
+            # Do not wait for the ranges still queued
+            for future, _ in pending:
+                future.cancel()
+            raise
+        if aggregator is not None:
+            write_summaries(writer, aggregator)
+    return writer.rows_written
+
+
+@dataclass
+class ConversionResult:
+    """Outcome of converting one report"""
+    input_path: str
+    output_path: str
+    rows: int
+    seconds: float
+    read_engine: str = None
+    # Parse time and DataFrame memory, when the report is parsed as a whole
+    parse_seconds: float = None
+    memory_mb: float = None
+    # Incremental mode: 'rebuilt', 'appended' (rows are the new ones) or 'unchanged'
+    incremental: str = None
+    # Seconds per stage, when the conversion is logged (see log_conversion)
+    stages: dict = None
+    # Rows added to the report store (the others were already stored)
+    stored_rows: int = None
+
+
+def default_output_path(csv_file_path, output_dir=None, output_format='xlsx'):
+    """
+    Output path of a report: same name with the format's extension (.xlsx,
+    .parquet, .feather or _clean.csv), next to it or in output_dir
+    """
+    base_name = os.path.splitext(csv_file_path)[0]
+    if output_dir is not None:
+        base_name = os.path.join(output_dir, os.path.basename(base_name))
+    return f"{base_name}{OUTPUT_SUFFIXES[output_format]}"
+
+
+@contextmanager
+def removed_on_error(output_path):
+    """Delete the output a conversion created if it fails or is cancelled, so no truncated file is left"""
+    created = not os.path.exists(output_path)
+    try:
+        yield
+    except BaseException:
+        if created and os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
+def convert_report(csv_file_path, excel_file_path=None, streaming=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, engine='auto', schema='auto', workers=None,
+                   read_engine='auto', output_format='auto', incremental=False, progress=None,
+                   sheet_name='Amazon Data', summaries=None, store=None):
+    """
+    Convert one Amazon CSV report to Excel (or another format), raising on failure
+
+    Args:
+        csv_file_path (str): Path to the input CSV file
+        excel_file_path (str): Path to the output file (optional)
+        streaming (bool): Convert chunk by chunk with bounded memory
+            (default: only for files above the streaming threshold)
+        chunk_size (int): Number of rows per chunk in streaming mode
+        engine (str): Excel writer backend ('auto', 'openpyxl' or 'xlsxwriter')
+        schema: 'auto' to infer dtypes, a ReportSchema, or None for pandas defaults
+        workers (int): Parse the report on this many processes (parallel mode,
+            always streamed to the workbook); 1 or None parses it in this process
+        read_engine (str): CSV parser ('auto', 'c' or 'pyarrow'); streaming
+            mode always uses pandas' C parser, and with 'auto' small reports
+            converted to xlsx are parsed with the csv module (see csv_to_excel_fast)
+        output_format (str): 'xlsx', 'parquet', 'feather', 'csv' (cleaned,
+            RFC 4180), or 'auto' to follow the extension of excel_file_path
+        incremental (bool): Only convert the rows added since the last run,
+            see convert_incremental
+        progress (Progress): Reports bytes read, rows parsed and rows written,
+            and stops the conversion with ConversionCancelled once its cancel
+            token is set
+        sheet_name (str): Name of the worksheet (xlsx)
+        summaries (list): Names of SUMMARIES ('all' for every one) or Summary
+            objects, added as sheets after the data (xlsx only); they are
+            aggregated from the parsed DataFrame or chunks, without re-reading
+        store: ReportStore (or the path of one) the parsed rows are also
+            added to, skipping the rows it already holds; committed only if
+            the conversion succeeds
+
+    Returns:
+        ConversionResult: Output path, row count, elapsed time and, when the
+        report is parsed as a whole, parse time and DataFrame memory
+    """
+    with log_conversion(input=csv_file_path) as fields:
+        result = _convert_report(csv_file_path, excel_file_path, streaming, chunk_size, engine, schema,
+                                 workers, read_engine, output_format, incremental, progress, sheet_name,
+                                 summaries, store)
+        if fields is not None:
+            fields.update(output=result.output_path,
+                          format=output_format_for(result.output_path, output_format),
+                          read_engine=result.read_engine, rows=result.rows, incremental=result.incremental,
+                          input_mb=round(os.path.getsize(csv_file_path) / (1024 * 1024), 1),
+                          stored_rows=result.stored_rows)
+    if fields is not None:
+        result.stages = fields['stages']
+    return result
+
+
+def _convert_report(csv_file_path, excel_file_path, streaming, chunk_size, engine, schema, workers,
+                    read_engine, output_format, incremental, progress, sheet_name, summaries, store):
+    """convert_report() without the logging"""
+    start = time.perf_counter()
+    if excel_file_path is None:
+        output_format = 'xlsx' if output_format == 'auto' else output_format
+        excel_file_path = default_output_path(csv_file_path, output_format=output_format)
+    output_format = output_format_for(excel_file_path, output_format)
+    if os.path.abspath(excel_file_path) == os.path.abspath(csv_file_path):
+        raise ValueError(f"The output file would overwrite the report: {excel_file_path}")
+    summaries = check_summaries(summaries, output_format)
+    if incremental:
+        return convert_incremental(csv_file_path, excel_file_path, output_format, streaming=streaming,
+                                   chunk_size=chunk_size, engine=engine, schema=schema,
+                                   workers=workers, read_engine=read_engine, progress=progress,
+                                   sheet_name=sheet_name, summaries=summaries, store=store)
+    if progress is not None and progress.total_bytes is None:
+        progress.total_bytes = os.path.getsize(csv_file_path)
+    if streaming is None:
+        streaming = should_stream(csv_file_path)
+    parallel = workers is not None and workers > 1
+    # Summaries and the store need DataFrames
+    fast = (read_engine == 'auto' and output_format == 'xlsx' and schema is not None and not summaries
+            and store is None and not streaming and not parallel and use_fast_path(csv_file_path))
+    read_engine = get_read_engine(read_engine)
+    result = ConversionResult(csv_file_path, excel_file_path, 0, 0.0, read_engine)
+
+    with removed_on_error(excel_file_path), importing(store, csv_file_path) as importer:
+        if parallel:
+            result.rows = csv_to_excel_parallel(csv_file_path, excel_file_path, sheet_name, workers=workers,
+                                                engine=engine, schema=schema, read_engine=read_engine,
+                                                output_format=output_format, progress=progress,
+                                                summaries=summaries, importer=importer)
+        elif streaming:
+            result.read_engine = 'c'
+            result.rows = csv_to_excel_streaming(csv_file_path, excel_file_path, sheet_name, chunk_size=chunk_size,
+                                                 engine=engine, schema=schema, output_format=output_format,
+                                                 progress=progress, summaries=summaries, importer=importer)
+        elif fast:
+            result.read_engine = 'csv'
+            result.rows = csv_to_excel_fast(csv_file_path, excel_file_path, sheet_name, engine=engine,
+                                            schema=schema, progress=progress)
+        else:
+            df = read_report(csv_file_path, schema=schema, read_engine=read_engine, progress=progress)
+            result.parse_seconds = time.perf_counter() - start
+            result.memory_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+            if importer is not None:
+                importer.add(df)
+            with get_writer(output_format, engine)(excel_file_path, sheet_name) as writer:
+                writer.progress = progress
+                writer.write(df)
+                if summaries:
+                    aggregator = SummaryAggregator(summaries)
+                    aggregator.add(df)
+                    write_summaries(writer, aggregator)
+            result.rows = len(df)
+
+    if importer is not None:
+        result.stored_rows = importer.new_rows
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+# Incremental conversions keep a manifest next to their output
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+
+# Formats whose output can be extended with new rows (xlsx is always rebuilt)
+APPENDABLE_FORMATS = [ParquetWriter.name, FeatherWriter.name, CleanCSVWriter.name]
+
+
+def manifest_path(output_path):
+    return f"{output_path}{MANIFEST_SUFFIX}"
+
+
+def read_manifest(output_path):
+    """Manifest of an incremental output, or None if missing or unreadable"""
+    try:
+        with open(manifest_path(output_path), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def write_manifest(output_path, manifest):
+    """Write the manifest atomically, so a crash never leaves half of it"""
+    path = manifest_path(output_path)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def hash_prefixes(path, lengths, block_size=NEWLINE_SCAN_BLOCK):
+    """
+    SHA-256 of the first bytes of a file for each length, in one pass
+
+    Returns:
+        list: Hex digests, in the order of lengths
+    """
+    digest = hashlib.sha256()
+    digests = {}
+    position = 0
+    with open(path, 'rb') as file:
+        for length in sorted(set(lengths)):
+            while position < length:
+                block = file.read(min(block_size, length - position))
+                if not block:
+                    break
+                digest.update(block)
+                position += len(block)
+            digests[length] = digest.copy().hexdigest()
+    return [digests[length] for length in lengths]
+
+
+def convert_incremental(csv_file_path, excel_file_path, output_format, streaming=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, engine='auto', schema='auto',
+                        workers=None, read_engine='auto', progress=None, sheet_name='Amazon Data',
+                        summaries=None, store=None):
+    """
+    Convert a growing report, appending only the rows added since the last run
+
+    A manifest next to the output records the byte offset and row count
+    already converted, a hash of the report up to that offset and the
+    schema. When the report still starts with exactly those bytes, only the
+    tail after the offset is parsed (with the report's header and the same
+    schema) and appended to the output. Otherwise, or when the output
+    cannot be appended to (xlsx, missing file, incompatible columns), the
+    output is rebuilt from scratch.
+
+    Args:
+        csv_file_path (str): Path to the input CSV file
+        excel_file_path (str): Path to the output file
+        output_format (str): 'xlsx', 'parquet', 'feather' or 'csv'
+        Other arguments: see convert_report
+
+    Returns:
+        ConversionResult: With incremental set to 'rebuilt', 'appended' or 'unchanged'
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(csv_file_path)
+    manifest = None
+    if output_format in APPENDABLE_FORMATS and os.path.exists(excel_file_path):
+        manifest = read_manifest(excel_file_path)
+        if manifest is not None and (manifest.get('format') != output_format or manifest['offset'] > size):
+            manifest = None
+    # Until this run succeeds, the output matches no manifest
+    if os.path.exists(manifest_path(excel_file_path)):
+        os.remove(manifest_path(excel_file_path))
+
+    with stage('read'):
+        if manifest is not None:
+            old_hash, new_hash = hash_prefixes(csv_file_path, [manifest['offset'], size])
+        else:
+            old_hash = None
+            new_hash, = hash_prefixes(csv_file_path, [size])
+
+    result = None
+    if manifest is not None and old_hash == manifest['prefix_sha256']:
+        report_schema = ReportSchema.from_dict(manifest['schema']) if manifest['schema'] else None
+        result = ConversionResult(csv_file_path, excel_file_path, 0, 0.0, get_read_engine(read_engine),
+                                  incremental='unchanged')
+        if size > manifest['offset']:
+            with open(csv_file_path, 'rb') as file, map_report(file) as data:
+                header = data.readline()
+            tail = parse_report_range(csv_file_path, header, manifest['offset'], size,
+                                      report_schema, result.read_engine)
+            try:
+                with importing(store, csv_file_path) as importer, \
+                        get_writer(output_format)(excel_file_path, append=True) as writer:
+                    writer.write(tail)
+                    if importer is not None:
+                        # Copies are numbered within the tail: a new copy of
+                        # an identical older row counts as already stored
+                        importer.add(tail)
+                result.rows, result.incremental = len(tail), 'appended'
+                if importer is not None:
+                    result.stored_rows = importer.new_rows
+            except ValueError:
+                # New rows do not fit the existing columns (the writer removed its copy)
+                result = None
+        if result is not None:
+            total_rows = manifest['rows'] + result.rows
+
+    if result is None:
+        report_schema = resolve_schema(csv_file_path, schema)
+        result = convert_report(csv_file_path, excel_file_path, streaming=streaming, chunk_size=chunk_size,
+                                engine=engine, schema=report_schema, workers=workers,
+                                read_engine=read_engine, output_format=output_format, progress=progress,
+                                sheet_name=sheet_name, summaries=summaries, store=store)
+        result.incremental = 'rebuilt'
+        total_rows = result.rows
+
+    # A report still being written may have grown meanwhile: then no manifest
+    # is written and the next run rebuilds
+    if os.path.getsize(csv_file_path) == size:
+        write_manifest(excel_file_path, {
+            'version': MANIFEST_VERSION,
+            'input': os.path.abspath(csv_file_path),
+            'format': output_format,
+            'offset': size,
+            'rows': total_rows,
+            'prefix_sha256': new_hash,
+            'schema': report_schema.to_dict() if report_schema is not None else None,
+        })
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+# Chunks parsed ahead per report while the writer is busy with another one
+MERGE_PREFETCH_CHUNKS = 2
+
+_END_OF_REPORT = object()
+
+
+def sheet_name_for(csv_file_path, used_names):
+    """
+    Build a valid, unique Excel sheet name from a report file name
+
+    Args:
+        csv_file_path (str): Path of the report
+        used_names (set): Names already taken (case-insensitive); updated in place
+    """
+    base = INVALID_SHEET_CHARS.sub('_', os.path.splitext(os.path.basename(csv_file_path))[0])
+    base = base[:MAX_SHEET_NAME_LENGTH] or 'Report'
+    name, counter = base, 2
+    while name.lower() in used_names:
+        suffix = f" ({counter})"
+        name = base[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        counter += 1
+    used_names.add(name.lower())
+    return name
+
+
+def _put_until_cancelled(chunks, item, cancelled):
+    while not cancelled.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _parse_into_queue(source, chunk_size, schema, chunks, cancelled):
+    """Parse one report chunk by chunk into a bounded queue (worker thread)"""
+    try:
+        for chunk in iter_report(source, chunk_size, schema=schema):
+            if not _put_until_cancelled(chunks, chunk, cancelled):
+                return
+        item = _END_OF_REPORT
+    except Exception as e:
+        item = e
+    _put_until_cancelled(chunks, item, cancelled)
+
+
+def read_header(source):
+    """Return the column names of a report without parsing its rows"""
+    with open_report(source) as report:
+        return list(pd.read_csv(report, sep=',', nrows=0).columns)
+
+
+def merge_reports(csv_files, excel_file_path, combined_sheet=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                  engine='auto', workers=None, schema='auto'):
+    """
+    Convert several Amazon CSV reports into one workbook, one sheet per report
+
+    Reports are parsed concurrently in worker threads, each one at most a few
+    chunks ahead of the single streaming writer, so the whole set is never
+    held in memory at once.
+
+    Args:
+        csv_files (list): Paths of the input CSV files
+        excel_file_path: Path (or binary file-like object) of the output workbook
+        combined_sheet (str): Name of an extra sheet with the rows of every
+            report and a 'report' column (optional)
+        chunk_size (int): Number of rows parsed per chunk
+        engine (str): Excel backend ('auto', 'openpyxl' or 'xlsxwriter')
+        workers (int): Number of parsing threads (default: one per report, up to CPU count)
+        schema: 'auto' to infer dtypes of each report, a ReportSchema, or None
+
+    Returns:
+        list: (csv_file, sheet_name, rows) for each report, in input order
+    """
+    used_names = set()
+    if combined_sheet:
+        used_names.add(combined_sheet.lower())
+        # The combined sheet uses the union of all headers, in first-seen order
+        combined_columns = ['report']
+        for csv_file in csv_files:
+            combined_columns.extend(c for c in read_header(csv_file) if c not in combined_columns)
+    sheet_names = [sheet_name_for(csv_file, used_names) for csv_file in csv_files]
+
+    workers = workers or min(len(csv_files), os.cpu_count() or 1)
+    cancelled = threading.Event()
+    queues = [queue.Queue(maxsize=MERGE_PREFETCH_CHUNKS) for _ in csv_files]
+    summary = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for csv_file, chunks in zip(csv_files, queues):
+                executor.submit(_parse_into_queue, csv_file, chunk_size, schema, chunks, cancelled)
+
+            with get_backend(engine)(excel_file_path, combined_sheet) as backend:
+                combined = backend.sheet
+                for csv_file, sheet_name, chunks in zip(csv_files, sheet_names, queues):
+                    sheet = backend.add_sheet(sheet_name)
+                    while True:
+                        chunk = chunks.get()
+                        if chunk is _END_OF_REPORT:
+                            break
+                        if isinstance(chunk, Exception):
+                            raise chunk
+                        sheet.write(chunk)
+                        if combined is not None:
+                            combined.write(chunk.assign(report=sheet_name).reindex(columns=combined_columns))
+                    summary.append((csv_file, sheet_name, sheet.rows_written))
+        finally:
+            # Unblock parsers still waiting on a full queue after an error
+            cancelled.set()
+
+    return summary
+
+
+# Report store: SQLite database of the rows of every converted report
+STORE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Seconds a conversion waits for another one writing to the same store
+STORE_BUSY_TIMEOUT = 300
+
+# Rows read from the store at a time when exporting
+STORE_EXPORT_ROWS = 50000
+
+# Kind of the number columns that only ever held integers: stored as floats
+# like every number, they are exported as integers again
+INTEGER = 'integer'
+
+# Indexed columns of the store, and the report columns they are taken from
+STORE_INDEX_COLUMNS = {
+    '_date': DATE_COLUMNS,
+    '_order_id': ['numéro de la commande', 'order id'],
+    '_sku': ['sku'],
+}
+
+STORE_TABLES = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE, imported_at TEXT,
+    rows INTEGER, new_rows INTEGER, columns TEXT);
+CREATE TABLE IF NOT EXISTS fields (name TEXT PRIMARY KEY COLLATE NOCASE, kind TEXT);
+CREATE TABLE IF NOT EXISTS records (
+    _id INTEGER PRIMARY KEY, _report INTEGER, _key INTEGER, _occurrence INTEGER,
+    _date TEXT, _order_id TEXT, _sku TEXT, UNIQUE (_key, _occurrence));
+CREATE INDEX IF NOT EXISTS records_date ON records (_date);
+CREATE INDEX IF NOT EXISTS records_order_id ON records (_order_id);
+CREATE INDEX IF NOT EXISTS records_sku ON records (_sku);
+CREATE TABLE IF NOT EXISTS sources (
+    row_id INTEGER, report_id INTEGER, PRIMARY KEY (row_id, report_id)) WITHOUT ROWID;
+"""
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _store_values(values):
+    """A column as stored: dates as ISO text, numbers as floats, None when missing"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.strftime(STORE_DATE_FORMAT)
+    elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype('float64')
+    values = values.astype(object)
+    return values.where(values.notna(), None)
+
+
+def _store_kind(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return DATETIME
+    if pd.api.types.is_integer_dtype(values):
+        return INTEGER
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return NUMBER
+    return TEXT
+
+
+def _store_day(value):
+    """Day of a date filter: a date, datetime or 'YYYY-MM-DD' string"""
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+
+
+class ReportStore:
+    """
+    Local SQLite store of the rows of converted reports, for lookups and
+    exports across months without reparsing the CSV files
+
+    Rows are deduplicated on a 64-bit hash of their key columns, so
+    overlapping exports add each row once. Identical rows within one report
+    are kept: the n-th copy of a row only matches the n-th copy of another
+    report. Every row records the reports it was found in, and is indexed by
+    date, order id and SKU.
+
+    Args:
+        path (str): SQLite database file, created if missing
+        key (list): Columns identifying a row (case-insensitive); None for
+            the key of an existing store, or every column for a new one.
+            The key is fixed when the store is created.
+    """
+
+    def __init__(self, path, key=None):
+        self.path = path
+        self.key = list(key) if key else None
+
+    def connect(self):
+        """
+        Open the store in autocommit mode, creating its tables
+
+        Raises:
+            ValueError: key differs from the key the store was created with
+        """
+        connection = sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT, isolation_level=None)
+        try:
+            # Readers do not block the conversions writing, and commits only sync at checkpoints
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(STORE_TABLES)
+            connection.execute("INSERT OR IGNORE INTO meta VALUES ('key', ?)", (json.dumps(self.key),))
+            stored_key = json.loads(connection.execute("SELECT value FROM meta WHERE name = 'key'").fetchone()[0])
+            if self.key is not None and [name.lower() for name in self.key] != [
+                    name.lower() for name in stored_key or []]:
+                raise ValueError(f"The store {self.path} deduplicates rows on "
+                                 f"{', '.join(stored_key) if stored_key else 'every column'}, not on "
+                                 f"{', '.join(self.key)}")
+            self.key = stored_key
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    @staticmethod
+    def _filters(date_from=None, date_to=None, order_id=None, sku=None):
+        clauses, params = [], []
+        if date_from is not None:
+            clauses.append('_date >= ?')
+            params.append(_store_day(date_from).strftime(STORE_DATE_FORMAT))
+        if date_to is not None:
+            # The whole last day
+            clauses.append('_date < ?')
+            params.append((_store_day(date_to) + timedelta(days=1)).strftime(STORE_DATE_FORMAT))
+        if order_id is not None:
+            clauses.append('_order_id = ?')
+            params.append(order_id)
+        if sku is not None:
+            clauses.append('_sku = ?')
+            params.append(sku)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+    def find_reports(self, **filters):
+        """
+        Reports containing the rows that match filters (date_from, date_to,
+        order_id, sku; dates are inclusive)
+
+        Returns:
+            list: (report path, matching rows, imported at), by path
+        """
+        where, params = self._filters(**filters)
+        connection = self.connect()
+        try:
+            return connection.execute(
+                f"SELECT reports.path, COUNT(*), reports.imported_at FROM records "
+                f"JOIN sources ON sources.row_id = records._id "
+                f"JOIN reports ON reports.id = sources.report_id{where} "
+                f"GROUP BY reports.id ORDER BY reports.path", params).fetchall()
+        finally:
+            connection.close()
+
+    def export(self, output_path, output_format='auto', engine='auto', sheet_name='Amazon Data',
+               progress=None, **filters):
+        """
+        Write the stored rows that match filters to a new workbook (or
+        another format), by date, read from the store chunk by chunk
+
+        The columns are those of the reports the rows come from, with their
+        dates and numbers typed as in a conversion. Columns that only ever
+        held integers are exported as nullable integers (Int64).
+
+        Args:
+            output_path (str): Path of the output file
+            output_format (str): 'xlsx', 'parquet', 'feather', 'csv' or
+                'auto' to follow the extension of output_path
+            engine (str): Excel backend ('auto', 'openpyxl' or 'xlsxwriter')
+            sheet_name (str): Name of the worksheet (xlsx)
+            progress (Progress): Reports the rows written
+            **filters: date_from, date_to, order_id, sku (see find_reports)
+
+        Returns:
+            int: Number of rows written
+
+        Raises:
+            ValueError: No stored row matches
+        """
+        where, params = self._filters(**filters)
+        connection = self.connect()
+        try:
+            columns = []
+            for report_columns, in connection.execute(
+                    f"SELECT columns FROM reports WHERE id IN (SELECT DISTINCT _report FROM records{where}) "
+                    f"ORDER BY id", params):
+                columns.extend(column for column in json.loads(report_columns) if column not in columns)
+            if not columns:
+                raise ValueError("No stored row matches")
+            kinds = dict(connection.execute('SELECT name, kind FROM fields'))
+            query = f"SELECT {', '.join(map(_quote, columns))} FROM records{where} ORDER BY _date, _id"
+            with get_writer(output_format_for(output_path, output_format), engine)(output_path, sheet_name) as writer:
+                writer.progress = progress
+                for chunk in pd.read_sql_query(query, connection, params=params, chunksize=STORE_EXPORT_ROWS):
+                    for column in chunk.columns:
+                        if kinds.get(column) == DATETIME:
+                            chunk[column] = pd.to_datetime(chunk[column], format=STORE_DATE_FORMAT)
+                        elif kinds.get(column) == INTEGER:
+                            chunk[column] = chunk[column].astype('Int64')
+                        elif kinds.get(column) == NUMBER:
+                            chunk[column] = chunk[column].astype('float64')
+                    writer.write(chunk)
+        finally:
+            connection.close()
+        return writer.rows_written
+
+
+class StoreImport:
+    """
+    Adds the rows of one report to a ReportStore, chunk by chunk
+
+    Chunks are staged in a temporary table; commit() then inserts the rows
+    not stored yet in one short write transaction, so conversions importing
+    into the same store in parallel only wait for each other at the end.
+
+    Args:
+        store (ReportStore): Store to add the rows to
+        report_path (str): Path of the report, recorded with its rows
+    """
+
+    def __init__(self, store, report_path):
+        self.connection = store.connect()
+        self.key = store.key
+        self.report_path = os.path.abspath(report_path)
+        self.columns = None
+        self.rows = 0
+        # Rows not stored before, known after commit()
+        self.new_rows = None
+
+    def _start(self, df):
+        self.columns = [str(column) for column in df.columns]
+        self.kinds = [_store_kind(df[column]) for column in df.columns]
+        self.key_columns = list(df.columns)
+        if self.key:
+            self.key_columns = [_find_column(df.columns, [name.strip().lower()]) for name in self.key]
+            missing = [name for name, column in zip(self.key, self.key_columns) if column is None]
+            if missing:
+                raise ValueError(f"The report has no {', '.join(missing)} column to deduplicate rows on")
+        self.index_columns = [_find_column(df.columns, candidates) for candidates in STORE_INDEX_COLUMNS.values()]
+        if self.index_columns[0] is not None and _store_kind(df[self.index_columns[0]]) != DATETIME:
+            # Dates left as text would not sort
+            self.index_columns[0] = None
+        self.connection.execute(
+            f"CREATE TEMP TABLE staging (_key INTEGER, {', '.join(STORE_INDEX_COLUMNS)}, "
+            f"{', '.join(map(_quote, self.columns))})")
+
+    def add(self, df):
+        """Stage a DataFrame (or a chunk of one)"""
+        with stage('store'):
+            if self.columns is None:
+                self._start(df)
+            # Chunks are typed separately: a column is integer only if it is in all of them
+            self.kinds = [NUMBER if kind == INTEGER and _store_kind(df[column]) != INTEGER else kind
+                          for kind, column in zip(self.kinds, df.columns)]
+            values = pd.DataFrame({column: _store_values(df[column]) for column in df.columns})
+            keys = pd.util.hash_pandas_object(values[self.key_columns], index=False).to_numpy().view('int64')
+            index = [values[column] if column is not None else itertools.repeat(None)
+                     for column in self.index_columns]
+            rows = zip(keys.tolist(), *index, *(values[column] for column in values.columns))
+            self.connection.executemany(f"INSERT INTO staging VALUES ({', '.join('?' * (4 + len(self.columns)))})",
+                                        rows)
+            self.rows += len(df)
+
+    def commit(self):
+        """Insert the staged rows not stored yet, and record the report"""
+        if self.columns is None:
+            self.new_rows = 0
+            return
+        with stage('store'):
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                stored = self._add_fields()
+                connection.execute(
+                    "INSERT INTO reports (path, imported_at, rows, columns) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET imported_at = excluded.imported_at, rows = excluded.rows, "
+                    "columns = excluded.columns",
+                    (self.report_path, datetime.now().isoformat(timespec='seconds'), self.rows, json.dumps(stored)))
+                report_id, = connection.execute('SELECT id FROM reports WHERE path = ?', (self.report_path,)).fetchone()
+                # The n-th copy of a row in this report, in key order for the index lookups
+                connection.execute(
+                    "CREATE TEMP TABLE staged AS SELECT *, "
+                    "ROW_NUMBER() OVER (PARTITION BY _key ORDER BY rowid) - 1 AS _occurrence FROM staging")
+                changes = connection.total_changes
+                connection.execute(
+                    f"INSERT OR IGNORE INTO records (_report, _key, _occurrence, {', '.join(STORE_INDEX_COLUMNS)}, "
+                    f"{', '.join(map(_quote, stored))}) SELECT ?, _key, _occurrence, "
+                    f"{', '.join(STORE_INDEX_COLUMNS)}, {', '.join(map(_quote, self.columns))} FROM staged",
+                    (report_id,))
+                self.new_rows = connection.total_changes - changes
+                connection.execute(
+                    "INSERT OR IGNORE INTO sources SELECT records._id, ? FROM staged "
+                    "JOIN records ON records._key = staged._key AND records._occurrence = staged._occurrence",
+                    (report_id,))
+                connection.execute('UPDATE reports SET new_rows = ? WHERE id = ?', (self.new_rows, report_id))
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+
+    def _add_fields(self):
+        """
+        Add the report's new columns to the records table, and turn integer
+        columns holding decimals in this report into number columns
+
+        Returns:
+            list: Stored names of the report's columns
+        """
+        fields = {name.lower(): (name, kind) for name, kind in
+                  self.connection.execute('SELECT name, kind FROM fields')}
+        stored = []
+        for column, kind in zip(self.columns, self.kinds):
+            if column.lower() not in fields:
+                self.connection.execute(f"ALTER TABLE records ADD COLUMN {_quote(column)}")
+                self.connection.execute('INSERT INTO fields VALUES (?, ?)', (column, kind))
+                fields[column.lower()] = (column, kind)
+            elif fields[column.lower()][1] == INTEGER and kind != INTEGER:
+                self.connection.execute('UPDATE fields SET kind = ? WHERE name = ?', (NUMBER, column))
+            stored.append(fields[column.lower()][0])
+        return stored
+
+    def close(self):
+        self.connection.close()
+
+
+@contextmanager
+def importing(store, report_path):
+    """
+    StoreImport of a report, committed when the block succeeds (None without a store)
+
+    Args:
+        store: ReportStore, path of one, or None
+        report_path (str): Path of the report
+    """
+    if store is None:
+        yield None
+        return
+    if not isinstance(store, ReportStore):
+        store = ReportStore(store)
+    importer = StoreImport(store, report_path)
+    try:
+        yield importer
+        importer.commit()
+    finally:
+        importer.close()
+
+
+# Background jobs: a finished job's output is kept this long before cleanup
+JOB_TTL_SECONDS = 3600
+
+# Minimum seconds between two writes of a job's progress file
+JOB_PROGRESS_INTERVAL = 0.5
+
+JOB_PROGRESS_FILE = 'progress.json'
+JOB_CANCEL_FILE = 'cancel'
+
+
+class JobQueueFull(Exception):
+    """Raised by ConversionJobs.submit when every worker is busy and the queue is full"""
+
+
+class CancelFile:
+    """Cancel token of a job in another process: set once its cancel file exists"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def set(self):
+        open(self.path, 'w').close()
+
+    def is_set(self):
+        return os.path.exists(self.path)
+
+
+def run_job(job_dir, input_path, output_path, options):
+    """
+    Convert the report of a job, in a worker process of ConversionJobs
+
+    The progress is written to the job's progress file for the pages polling
+    it, and the input is deleted once converted.
+
+    Args:
+        job_dir (str): Directory of the job
+        input_path (str): Report saved there
+        output_path (str): Output file, in the same directory
+        options (dict): Extra convert_report arguments (engine, sheet_name...)
+
+    Returns:
+        dict: rows, columns and seconds of the conversion
+    """
+    progress_path = os.path.join(job_dir, JOB_PROGRESS_FILE)
+    last_write = 0.0
+
+    def save_progress(progress):
+        nonlocal last_write
+        now = time.monotonic()
+        if now - last_write >= JOB_PROGRESS_INTERVAL:
+            last_write = now
+            with open(f"{progress_path}.tmp", 'w', encoding='utf-8') as file:
+                json.dump({'fraction': progress.fraction, 'rows_written': progress.rows_written}, file)
+            os.replace(f"{progress_path}.tmp", progress_path)
+
+    progress = Progress(save_progress, CancelFile(os.path.join(job_dir, JOB_CANCEL_FILE)))
+    # The job is running once its progress file exists
+    save_progress(progress)
+    try:
+        columns = len(read_sample(input_path, nrows=0))
+        result = convert_report(input_path, output_path, progress=progress, **options)
+    finally:
+        os.remove(input_path)
+    return {'rows': result.rows, 'columns': columns, 'seconds': result.seconds}
+
+
+@dataclass
+class ConversionJob:
+    """A conversion submitted to ConversionJobs"""
+    id: str
+    name: str
+    directory: str
+    output_path: str
+    future: object = None
+    submitted_at: float = None
+    finished_at: float = None
+
+    @property
+    def state(self):
+        """'pending', 'running', 'done', 'failed' or 'cancelled'"""
+        if self.future is None:
+            # Upload still being saved
+            return 'pending'
+        if self.future.cancelled():
+            return 'cancelled'
+        if not self.future.done():
+            # The pool marks a few queued calls as running ahead of time
+            started = os.path.exists(os.path.join(self.directory, JOB_PROGRESS_FILE))
+            return 'running' if started else 'pending'
+        error = self.future.exception()
+        if error is None:
+            return 'done'
+        return 'cancelled' if isinstance(error, ConversionCancelled) else 'failed'
+
+    @property
+    def result(self):
+        """rows, columns and seconds of a finished conversion (see run_job)"""
+        return self.future.result() if self.state == 'done' else None
+
+    @property
+    def error(self):
+        return str(self.future.exception()).strip() if self.state == 'failed' else None
+
+    @property
+    def progress(self):
+        """Fraction of the conversion done, from 0 to 1"""
+        if self.future is not None and self.future.done():
+            return 1.0
+        try:
+            with open(os.path.join(self.directory, JOB_PROGRESS_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)['fraction']
+        except (OSError, ValueError, KeyError):
+            return 0.0
+
+
+class ConversionJobs:
+    """
+    Conversions run in the background, in a shared process pool, with their
+    files spilled to disk
+
+    Each job gets its own directory: the uploaded report is saved there,
+    converted by a worker process and deleted, and the output stays on disk
+    until ttl seconds after the conversion finished. Callers only keep the
+    job id, so memory no longer grows with the number of users times the
+    size of their reports.
+
+    Args:
+        directory (str): Directory of the jobs (created if needed)
+        workers (int): Conversions run at once (default: CPU count)
+        ttl (float): Seconds a finished job is kept
+        max_queued (int): Jobs waiting for a worker beyond which submit
+            raises JobQueueFull (default: unbounded)
+    """
+
+    def __init__(self, directory, workers=None, ttl=JOB_TTL_SECONDS, max_queued=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.executor = self._new_pool()
+        self.jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, source, name, output_format='xlsx', **options):
+        """
+        Save a report to disk and queue its conversion
+
+        Args:
+            source: Binary file-like object (an upload) or bytes
+            name (str): Original file name of the report
+            output_format (str): 'xlsx', 'parquet', 'feather' or 'csv'
+            **options: Extra convert_report arguments (engine, sheet_name...)
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFull: Before anything is read from source, when
+                max_queued jobs already wait for a worker
+        """
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.directory, job_id)
+        output_path = default_output_path(os.path.join(job_dir, 'output.csv'), output_format=output_format)
+        job = ConversionJob(job_id, name, job_dir, output_path, submitted_at=time.time())
+        with self._lock:
+            # The job holds its place in the queue while its upload is saved
+            if self._full():
+                raise JobQueueFull(f"{self.workers} conversions running and {self.max_queued} queued")
+            self.jobs[job_id] = job
+
+        try:
+            os.makedirs(job_dir)
+            input_path = os.path.join(job_dir, 'input.csv')
+            with open(input_path, 'wb') as file:
+                if isinstance(source, (bytes, bytearray, memoryview)):
+                    file.write(source)
+                else:
+                    shutil.copyfileobj(source, file, REPAIR_BLOCK_SIZE)
+
+            arguments = (run_job, job_dir, input_path, output_path, dict(options, output_format=output_format))
+            try:
+                job.future = self.executor.submit(*arguments)
+            except BrokenProcessPool:
+                # A worker died (out of memory...): its jobs failed, later ones get a new pool
+                self.executor = self._new_pool()
+                job.future = self.executor.submit(*arguments)
+        except BaseException:
+            with self._lock:
+                del self.jobs[job_id]
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        job.future.add_done_callback(lambda future: setattr(job, 'finished_at', time.time()))
+        return job_id
+
+    def _full(self):
+        if self.max_queued is None:
+            return False
+        active = sum(job.future is None or not job.future.done() for job in self.jobs.values())
+        return active >= self.workers + self.max_queued
+
+    def full(self):
+        """Whether submit would raise JobQueueFull now"""
+        with self._lock:
+            return self._full()
+
+    def counts(self):
+        """Number of current jobs per state"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        counts = dict.fromkeys(['pending', 'running', 'done', 'failed', 'cancelled'], 0)
+        for job in jobs:
+            counts[job.state] += 1
+        return counts
+
+    def _new_pool(self):
+        # Spawned rather than forked from a multithreaded web server
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def get(self, job_id):
+        """The job, or None once it expired (or if unknown)"""
+        self.cleanup()
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Stop a job: dropped if still pending, stopped at the next block otherwise"""
+        job = self.get(job_id)
+        if job is not None and job.future is not None and not job.future.cancel() and not job.future.done():
+            CancelFile(os.path.join(job.directory, JOB_CANCEL_FILE)).set()
+
+    def cleanup(self):
+        """Delete the jobs finished more than ttl seconds ago, and leftovers of earlier runs"""
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > self.ttl]
+            for job_id in expired:
+                del self.jobs[job_id]
+            known = set(self.jobs)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stale = name not in known and now - os.path.getmtime(path) > self.ttl
+            except OSError:
+                continue
+            if name in expired or stale:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,26 +1,113 @@
 # -*- coding: utf-8 -*-
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
 import os
 import threading
-import io
+import time
+from concurrent.futures import ThreadPoolExecutor
 from tkinterdnd2 import DND_FILES, TkinterDnD
-import shutil
+from converter import ConversionCancelled, Progress, convert_report, default_output_path
+
+# Reports converted at once. Parsing releases the GIL but writing the
+# workbook mostly does not, so a few threads are enough to overlap them
+CONVERSION_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Milliseconds between two refreshes of the elapsed times
+REFRESH_MS = 500
+
+def convert_to_excel(file_path, converted_file, progress=None):
+    """
+    Conversion run by a GUI worker thread, straight to the chosen destination
+    
+    The workbook is written to a temporary file next to converted_file, then
+    renamed: a failed or cancelled conversion never leaves a truncated
+    workbook behind, nor replaces an existing one.
+    
+    Args:
+        file_path (str): Path to the CSV file
+        converted_file (str): Path of the Excel file
+        progress (Progress): Progress callback and cancel token
+    
+    Returns:
+        ConversionResult: Output path, row count and elapsed time
+    """
+    temp_file = os.path.join(os.path.dirname(converted_file) or ".",
+                             f".{os.path.basename(converted_file)}.{threading.get_ident()}.tmp")
+    try:
+        # Same conversion as main.py: small reports skip pandas, large ones are streamed
+        result = convert_report(file_path, temp_file, output_format='xlsx', progress=progress)
+        os.replace(temp_file, converted_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    result.output_path = converted_file
+    return result
+
+def csv_files_in(paths):
+    """
+    CSV files among dropped or selected paths, directories expanded to the
+    CSV files they contain
+    
+    Returns:
+        tuple: (list of CSV files, list of rejected paths)
+    """
+    csv_files, rejected = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            csv_files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                    if name.lower().endswith('.csv')))
+        elif path.lower().endswith('.csv'):
+            csv_files.append(path)
+        else:
+            rejected.append(path)
+    return csv_files, rejected
+
+class QueuedFile:
+    """One report of the conversion queue, shown as a row of the file list"""
+    
+    def __init__(self, file_path, item):
+        self.file_path = file_path
+        self.item = item
+        self.output_path = None
+        # 'queued', 'converting', 'done', 'failed' or 'cancelled'
+        self.state = 'queued'
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.start = None
+        self.seconds = None
+        self.fraction = 0.0
+        self.bytes_read = 0
+        self.rows = 0
+        self.error = None
+        # Counted in the summary shown once the batch is finished
+        self.reported = False
+    
+    @property
+    def active(self):
+        """Submitted to the pool and not finished yet"""
+        return self.future is not None and self.state in ('queued', 'converting')
+    
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed', 'cancelled')
 
 class CSVToExcelGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("CSV to Excel Converter")
-        self.root.geometry("600x400")
+        self.root.geometry("820x520")
         self.root.configure(bg='#f0f0f0')
         
         # Variables
-        self.converted_file = None
-        self.is_converting = False
+        self.jobs = []
+        self.output_dir = None
+        self.executor = None
+        self.refreshing = False
+        self.closed = False
         
         self.setup_ui()
-        
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+    
     def setup_ui(self):
         # Main frame
         main_frame = tk.Frame(self.root, bg='#f0f0f0')
@@ -34,18 +121,18 @@ class CSVToExcelGUI:
             bg='#f0f0f0',
             fg='#2c3e50'
         )
-        title.pack(pady=(0, 30))
+        title.pack(pady=(0, 20))
         
-        # Drag and drop area
+        # Drag and drop area, showing the conversion queue once files are added
         self.drop_frame = tk.Frame(
             main_frame,
             bg='#ecf0f1',
             relief=tk.RAISED,
             bd=2,
-            height=200,
+            height=250,
             width=500
         )
-        self.drop_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
+        self.drop_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         self.drop_frame.pack_propagate(False)
         
         # Enable drag and drop
@@ -55,6 +142,34 @@ class CSVToExcelGUI:
         # Drop zone content
         self.setup_drop_zone()
         
+        # Output folder
+        output_frame = tk.Frame(main_frame, bg='#f0f0f0')
+        output_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.output_label = tk.Label(
+            output_frame,
+            text="Save to: (choose a folder)",
+            font=("Arial", 10),
+            bg='#f0f0f0',
+            fg='#2c3e50',
+            anchor=tk.W
+        )
+        self.output_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.output_btn = tk.Button(
+            output_frame,
+            text="💾 Output Folder...",
+            command=self.choose_output_dir,
+            font=("Arial", 10),
+            bg='#e74c3c',
+            fg='white',
+            relief=tk.FLAT,
+            padx=10,
+            pady=5,
+            cursor='hand2'
+        )
+        self.output_btn.pack(side=tk.RIGHT)
+        
         # Button frame
         button_frame = tk.Frame(main_frame, bg='#f0f0f0')
         button_frame.pack(fill=tk.X, pady=(0, 10))
@@ -90,13 +205,13 @@ class CSVToExcelGUI:
         )
         self.convert_btn.pack(side=tk.LEFT, padx=(0, 10))
         
-        # Download button
-        self.download_btn = tk.Button(
+        # Cancel button: the selected files, or all of them
+        self.cancel_btn = tk.Button(
             button_frame,
-            text="💾 Save Excel File",
-            command=self.download_file,
+            text="✖ Cancel",
+            command=self.cancel_conversion,
             font=("Arial", 12),
-            bg='#e74c3c',
+            bg='#95a5a6',
             fg='white',
             relief=tk.FLAT,
             padx=20,
@@ -104,16 +219,23 @@ class CSVToExcelGUI:
             cursor='hand2',
             state=tk.DISABLED
         )
-        self.download_btn.pack(side=tk.LEFT)
+        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10))
         
-        # Progress bar
-        self.progress = ttk.Progressbar(
-            main_frame,
-            mode='indeterminate',
-            length=400
+        # Clear button: removes the finished files from the list
+        self.clear_btn = tk.Button(
+            button_frame,
+            text="🧹 Clear Finished",
+            command=self.clear_finished,
+            font=("Arial", 12),
+            bg='#7f8c8d',
+            fg='white',
+            relief=tk.FLAT,
+            padx=20,
+            pady=10,
+            cursor='hand2',
+            state=tk.DISABLED
         )
-        self.progress.pack(pady=(10, 0))
-        self.progress.pack_forget()  # Hide initially
+        self.clear_btn.pack(side=tk.LEFT)
         
         # Status label
         self.status_label = tk.Label(
@@ -124,193 +246,275 @@ class CSVToExcelGUI:
             fg='#7f8c8d'
         )
         self.status_label.pack(pady=(10, 0))
-        
+    
     def setup_drop_zone(self):
-        # Clear drop frame
-        for widget in self.drop_frame.winfo_children():
-            widget.destroy()
-            
-        # Drop zone icon and text
-        if not hasattr(self, 'file_path') or not self.file_path:
-            icon_label = tk.Label(
-                self.drop_frame,
-                text="📄",
-                font=("Arial", 48),
-                bg='#ecf0f1',
-                fg='#bdc3c7'
-            )
-            icon_label.pack(expand=True)
-            
-            text_label = tk.Label(
-                self.drop_frame,
-                text="Drag & Drop your CSV file here\nor click Browse Files",
-                font=("Arial", 14),
-                bg='#ecf0f1',
-                fg='#7f8c8d',
-                justify=tk.CENTER
-            )
-            text_label.pack(expand=True)
-        else:
-            # Show file info
-            file_name = os.path.basename(self.file_path)
-            icon_label = tk.Label(
-                self.drop_frame,
-                text="✅",
-                font=("Arial", 36),
-                bg='#ecf0f1',
-                fg='#27ae60'
-            )
-            icon_label.pack(expand=True)
-            
-            name_label = tk.Label(
-                self.drop_frame,
-                text=file_name,
-                font=("Arial", 14, "bold"),
-                bg='#ecf0f1',
-                fg='#2c3e50'
-            )
-            name_label.pack(expand=True)
-            
-            info_label = tk.Label(
-                self.drop_frame,
-                text="Ready to convert",
-                font=("Arial", 10),
-                bg='#ecf0f1',
-                fg='#27ae60'
-            )
-            info_label.pack(expand=True)
+        # Drop zone icon and text, shown while the queue is empty
+        self.placeholder = tk.Frame(self.drop_frame, bg='#ecf0f1')
+        
+        icon_label = tk.Label(
+            self.placeholder,
+            text="📄",
+            font=("Arial", 48),
+            bg='#ecf0f1',
+            fg='#bdc3c7'
+        )
+        icon_label.pack(expand=True)
+        
+        text_label = tk.Label(
+            self.placeholder,
+            text="Drag & Drop your CSV files here\nor click Browse Files",
+            font=("Arial", 14),
+            bg='#ecf0f1',
+            fg='#7f8c8d',
+            justify=tk.CENTER
+        )
+        text_label.pack(expand=True)
+        self.placeholder.pack(fill=tk.BOTH, expand=True)
+        
+        # One row per file: status, rows, elapsed time and throughput
+        self.queue_frame = tk.Frame(self.drop_frame, bg='#ecf0f1')
+        columns = ("file", "status", "rows", "elapsed", "throughput")
+        self.file_list = ttk.Treeview(self.queue_frame, columns=columns, show='headings')
+        for column, heading, width, anchor in [("file", "File", 260, tk.W),
+                                               ("status", "Status", 150, tk.W),
+                                               ("rows", "Rows", 90, tk.E),
+                                               ("elapsed", "Elapsed", 70, tk.E),
+                                               ("throughput", "Throughput", 110, tk.E)]:
+            self.file_list.heading(column, text=heading)
+            self.file_list.column(column, width=width, anchor=anchor, stretch=column == "file")
+        scrollbar = ttk.Scrollbar(self.queue_frame, orient=tk.VERTICAL, command=self.file_list.yview)
+        self.file_list.configure(yscrollcommand=scrollbar.set)
+        self.file_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.file_list.drop_target_register(DND_FILES)
+        self.file_list.dnd_bind('<<Drop>>', self.handle_drop)
+        self.file_list.bind('<Double-1>', self.show_error)
     
     def handle_drop(self, event):
-        file_path = event.data
-        # Remove curly braces if present
-        if file_path.startswith('{') and file_path.endswith('}'):
-            file_path = file_path[1:-1]
-        
-        if file_path.lower().endswith('.csv'):
-            self.set_file(file_path)
-        else:
-            messagebox.showerror("Invalid File", "Please select a CSV file.")
+        # Several files arrive as a Tcl list: {C:/My Reports/a.csv} C:/b.csv
+        self.add_files(self.root.tk.splitlist(event.data))
     
     def browse_file(self):
-        file_path = filedialog.askopenfilename(
-            title="Select CSV File",
+        file_paths = filedialog.askopenfilenames(
+            title="Select CSV Files",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
-        if file_path:
-            self.set_file(file_path)
+        if file_paths:
+            self.add_files(file_paths)
     
-    def set_file(self, file_path):
-        self.file_path = file_path
-        self.converted_file = None
-        self.setup_drop_zone()
-        self.convert_btn.config(state=tk.NORMAL)
-        self.download_btn.config(state=tk.DISABLED)
-        self.status_label.config(text=f"File loaded: {os.path.basename(file_path)}")
+    def add_files(self, paths):
+        csv_files, rejected = csv_files_in(paths)
+        # A file already waiting or converting is not queued twice
+        pending = {os.path.abspath(job.file_path) for job in self.jobs if not job.finished}
+        for file_path in csv_files:
+            if os.path.abspath(file_path) in pending:
+                continue
+            pending.add(os.path.abspath(file_path))
+            job = QueuedFile(file_path, None)
+            job.item = self.file_list.insert('', tk.END, values=self.row_values(job))
+            self.jobs.append(job)
+        
+        if self.jobs:
+            self.placeholder.pack_forget()
+            self.queue_frame.pack(fill=tk.BOTH, expand=True)
+        self.update_status()
+        if rejected:
+            names = "\n".join(os.path.basename(path) for path in rejected)
+            messagebox.showerror("Invalid File", f"Please select CSV files. Ignored:\n{names}")
+    
+    def choose_output_dir(self):
+        initial_dir = self.output_dir or (os.path.dirname(self.jobs[0].file_path) if self.jobs else None)
+        output_dir = filedialog.askdirectory(title="Save Excel Files To", initialdir=initial_dir)
+        if output_dir:
+            self.output_dir = output_dir
+            self.output_label.config(text=f"Save to: {output_dir}")
+        return bool(output_dir)
     
     def start_conversion(self):
-        if self.is_converting:
+        # Files can be added and converted while others are still converting
+        queued = [job for job in self.jobs if job.state == 'queued' and job.future is None]
+        if not queued:
             return
-            
-        self.is_converting = True
-        self.convert_btn.config(state=tk.DISABLED, text="Converting...")
-        self.progress.pack(pady=(10, 0))
-        self.progress.start(10)
-        self.status_label.config(text="Converting CSV to Excel...")
+        if self.output_dir is None and not self.choose_output_dir():
+            return
+        
+        # Excel files already planned keep their name: same-named reports get a suffix
+        used = {os.path.abspath(job.output_path) for job in self.jobs if job.active}
+        for job in queued:
+            output_path = default_output_path(job.file_path, self.output_dir)
+            base_name, number = os.path.splitext(output_path)[0], 2
+            while os.path.abspath(output_path) in used:
+                output_path, number = f"{base_name} ({number}).xlsx", number + 1
+            used.add(os.path.abspath(output_path))
+            job.output_path = output_path
         
-        # Run conversion in separate thread
-        thread = threading.Thread(target=self.convert_file)
-        thread.daemon = True
-        thread.start()
+        existing = [job.output_path for job in queued if os.path.exists(job.output_path)]
+        if existing:
+            names = "\n".join(os.path.basename(path) for path in existing)
+            if not messagebox.askyesno("Overwrite Files",
+                                       f"These files already exist in {self.output_dir}:\n{names}\n\n"
+                                       f"Replace them?"):
+                return
+        
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=CONVERSION_WORKERS)
+        for job in queued:
+            job.future = self.executor.submit(self.convert_file, job)
+            self.update_row(job)
+        self.update_status()
+        if not self.refreshing:
+            self.refreshing = True
+            self.root.after(REFRESH_MS, self.refresh)
     
-    def convert_file(self):
+    def post(self, callback, *args):
+        # Run a UI update on the main thread, unless the window is closed
+        if self.closed:
+            return
         try:
-            # Convert CSV to Excel (same logic as main.py)
-            with open(self.file_path, 'r', encoding='utf-8-sig') as file:
-                lines = file.readlines()
-            
-            # Fix malformed CSV
-            fixed_lines = []
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if i == 0:  # Header row
-                    fixed_lines.append(line)
-                else:  # Data rows
-                    if line.startswith('"') and line.endswith('"'):
-                        line = line[1:-1]
-                        line = line.replace('""', '"')
-                    fixed_lines.append(line)
-            
-            # Parse with pandas
-            csv_string = '\n'.join(fixed_lines)
-            df = pd.read_csv(io.StringIO(csv_string), sep=',')
-            
-            # Create output file path
-            base_name = os.path.splitext(self.file_path)[0]
-            self.converted_file = f"{base_name}_converted.xlsx"
-            
-            # Write to Excel
-            with pd.ExcelWriter(self.converted_file, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Amazon Data', index=False)
-                
-                # Auto-adjust column widths
-                worksheet = writer.sheets['Amazon Data']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            # Update UI on main thread
-            self.root.after(0, self.conversion_success)
-            
-        except Exception as e:
-            self.root.after(0, lambda: self.conversion_error(str(e)))
+            self.root.after(0, callback, *args)
+        except (RuntimeError, tk.TclError):
+            pass
     
-    def conversion_success(self):
-        self.is_converting = False
-        self.progress.stop()
-        self.progress.pack_forget()
-        self.convert_btn.config(state=tk.NORMAL, text="🔄 Convert to Excel")
-        self.download_btn.config(state=tk.NORMAL)
-        self.status_label.config(text="✅ Conversion completed successfully!")
+    def convert_file(self, job):
+        # Runs on a pool thread: the UI is only updated through post()
+        if job.cancel_event.is_set():
+            self.post(self.job_finished, job, 'cancelled', None, None)
+            return
+        job.start = time.perf_counter()
+        job.state = 'converting'
+        self.post(self.update_row, job)
+        
+        def report_progress(progress):
+            # Called once per block read or batch written
+            job.fraction, job.bytes_read, job.rows = progress.fraction, progress.bytes_read, progress.rows_written
+            self.post(self.update_row, job)
         
-        messagebox.showinfo("Success", "CSV file converted to Excel successfully!")
+        try:
+            result = convert_to_excel(job.file_path, job.output_path,
+                                      progress=Progress(report_progress, job.cancel_event))
+            self.post(self.job_finished, job, 'done', result, None)
+        except ConversionCancelled:
+            self.post(self.job_finished, job, 'cancelled', None, None)
+        except Exception as e:
+            self.post(self.job_finished, job, 'failed', None, str(e))
     
-    def conversion_error(self, error_msg):
-        self.is_converting = False
-        self.progress.stop()
-        self.progress.pack_forget()
-        self.convert_btn.config(state=tk.NORMAL, text="🔄 Convert to Excel")
-        self.status_label.config(text="❌ Conversion failed")
+    def row_values(self, job):
+        elapsed = job.seconds
+        if elapsed is None and job.start is not None:
+            elapsed = time.perf_counter() - job.start
         
-        messagebox.showerror("Error", f"Conversion failed:\n{error_msg}")
+        if job.state == 'converting':
+            status = "Cancelling..." if job.cancel_event.is_set() else f"Converting {job.fraction:.0%}"
+            throughput = f"{job.bytes_read / (1024 * 1024) / elapsed:.1f} MB/s" if elapsed else ""
+        elif job.state == 'done':
+            status = "✅ Done"
+            throughput = f"{job.rows / elapsed:,.0f} rows/s" if elapsed else ""
+        else:
+            status = {'queued': "Waiting" if job.future is not None else "Queued",
+                      'failed': "❌ Failed (double-click)",
+                      'cancelled': "Cancelled"}[job.state]
+            throughput = ""
+        return (os.path.basename(job.file_path), status,
+                f"{job.rows:,}" if job.rows else "",
+                f"{elapsed:.1f}s" if elapsed is not None else "",
+                throughput)
     
-    def download_file(self):
-        if not self.converted_file or not os.path.exists(self.converted_file):
-            messagebox.showerror("Error", "No converted file available.")
-            return
+    def update_row(self, job):
+        if self.file_list.exists(job.item):
+            self.file_list.item(job.item, values=self.row_values(job))
+    
+    def refresh(self):
+        # Keep the elapsed times of the running conversions moving
+        for job in self.jobs:
+            if job.state == 'converting':
+                self.update_row(job)
+        if any(job.active for job in self.jobs):
+            self.root.after(REFRESH_MS, self.refresh)
+        else:
+            self.refreshing = False
+    
+    def job_finished(self, job, state, result, error_msg):
+        job.state = state
+        job.error = error_msg
+        if job.start is not None:
+            job.seconds = time.perf_counter() - job.start
+        if result is not None:
+            job.rows, job.seconds = result.rows, result.seconds
+        self.update_row(job)
+        self.update_status()
         
-        # Ask user where to save
-        save_path = filedialog.asksaveasfilename(
-            title="Save Excel File",
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-            initialname=os.path.basename(self.converted_file)
-        )
+        if not any(job.active for job in self.jobs):
+            self.conversions_finished()
+    
+    def conversions_finished(self):
+        # Summary of the batch, once every submitted file is finished
+        batch = [job for job in self.jobs if job.finished and not job.reported]
+        for job in batch:
+            job.reported = True
+        done = sum(job.state == 'done' for job in batch)
+        failed = sum(job.state == 'failed' for job in batch)
+        if failed:
+            messagebox.showerror("Error", f"{failed} of {len(batch)} conversions failed "
+                                          f"(double-click a file for details).")
+        elif done:
+            messagebox.showinfo("Success", f"{done} CSV file(s) converted to Excel in:\n{self.output_dir}")
+    
+    def update_status(self):
+        counts = {}
+        for job in self.jobs:
+            state = 'waiting' if job.state == 'queued' and job.future is not None else job.state
+            counts[state] = counts.get(state, 0) + 1
+        parts = [f"{counts[state]} {label}" for state, label in [('converting', "converting"),
+                                                                  ('waiting', "waiting"),
+                                                                  ('queued', "queued"),
+                                                                  ('done', "✅ converted"),
+                                                                  ('failed', "❌ failed"),
+                                                                  ('cancelled', "cancelled")]
+                 if counts.get(state)]
+        self.status_label.config(text=", ".join(parts) if parts else "Ready to convert CSV files")
         
-        if save_path:
-            try:
-                shutil.copy2(self.converted_file, save_path)
-                self.status_label.config(text=f"📁 File saved: {os.path.basename(save_path)}")
-                messagebox.showinfo("Success", f"File saved successfully!\n{save_path}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file:\n{str(e)}")
+        self.convert_btn.config(state=tk.NORMAL if counts.get('queued') else tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL if any(job.active for job in self.jobs) else tk.DISABLED)
+        self.clear_btn.config(state=tk.NORMAL if any(job.finished for job in self.jobs) else tk.DISABLED)
+    
+    def cancel_conversion(self):
+        selected = set(self.file_list.selection())
+        targets = [job for job in self.jobs
+                   if not job.finished and (not selected or job.item in selected)]
+        for job in targets:
+            job.cancel_event.set()
+            if job.future is None or job.future.cancel():
+                # Not started yet
+                self.job_finished(job, 'cancelled', None, None)
+            else:
+                self.update_row(job)
+    
+    def clear_finished(self):
+        for job in self.jobs:
+            if job.finished:
+                self.file_list.delete(job.item)
+        self.jobs = [job for job in self.jobs if not job.finished]
+        if not self.jobs:
+            self.queue_frame.pack_forget()
+            self.placeholder.pack(fill=tk.BOTH, expand=True)
+        self.update_status()
+    
+    def show_error(self, event):
+        item = self.file_list.identify_row(event.y)
+        for job in self.jobs:
+            if job.item == item and job.error:
+                messagebox.showerror("Error", f"Conversion of {os.path.basename(job.file_path)} "
+                                              f"failed:\n{job.error}")
+    
+    def close(self):
+        # Stop the conversions in progress: their temporary files are removed
+        self.closed = True
+        for job in self.jobs:
+            job.cancel_event.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
 
 def main():
     root = TkinterDnD.Tk()
@@ -318,4 +522,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
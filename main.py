@@ -1,65 +1,53 @@
 # -*- coding: utf-8 -*-
-import pandas as pd
-import sys
+import argparse
+import cProfile
+import glob
+import json
 import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from converter import (DEFAULT_CHUNK_SIZE, ENGINE_CHOICES, FORMAT_CHOICES, FORMAT_EXTENSIONS,
+                       OUTPUT_SUFFIXES, READ_ENGINE_CHOICES, SUMMARIES, ReportStore, UsageError, convert_report,
+                       default_output_path, enable_json_logs, hash_prefixes, log_conversion, manifest_path,
+                       merge_reports)
 
-def csv_to_excel(csv_file_path, excel_file_path=None):
+def csv_to_excel(csv_file_path, excel_file_path=None, streaming=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 engine='auto', schema='auto', workers=None, read_engine='auto', output_format='auto',
+                 incremental=False, summaries=None, store=None):
     """
-    Convert CSV file to Excel format
+    Convert CSV file to Excel format (or Parquet, Feather or a cleaned CSV)
     
     Args:
         csv_file_path (str): Path to the input CSV file
-        excel_file_path (str): Path to the output Excel file (optional)
+        excel_file_path (str): Path to the output file (optional)
+        streaming (bool): Convert chunk by chunk with bounded memory
+            (default: only for files above the streaming threshold)
+        chunk_size (int): Number of rows per chunk in streaming mode
+        engine (str): Excel writer backend ('auto', 'openpyxl' or 'xlsxwriter')
+        schema: 'auto' to infer column dtypes, or None to keep pandas defaults
+        workers (int): Parse the file on this many processes (default: one)
+        read_engine (str): CSV parser ('auto', 'c' or 'pyarrow')
+        output_format (str): 'xlsx', 'parquet', 'feather', 'csv', or 'auto'
+            to follow the extension of excel_file_path (default: xlsx)
+        incremental (bool): Only convert the rows added since the last run
+        summaries (list): Summary sheets added to the workbook: names of
+            SUMMARIES ('sku', 'day', 'marketplace', 'type', 'day_type') or 'all'
+        store: ReportStore (or its path) the rows are also added to
+    
+    Returns:
+        str: Path of the output file, or None if the conversion failed
     """
     try:
-        # Read and preprocess the CSV file to handle malformed quotes
-        with open(csv_file_path, 'r', encoding='utf-8-sig') as file:
-            lines = file.readlines()
-        
-        # Fix the malformed CSV by removing outer quotes from data rows
-        fixed_lines = []
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if i == 0:  # Header row
-                fixed_lines.append(line)
-            else:  # Data rows - remove outer quotes and fix inner double quotes
-                if line.startswith('"') and line.endswith('"'):
-                    # Remove outer quotes
-                    line = line[1:-1]
-                    # Fix double quotes inside (convert "" to ")
-                    line = line.replace('""', '"')
-                fixed_lines.append(line)
-        
-        # Write fixed CSV to temporary string and read with pandas
-        import io
-        csv_string = '\n'.join(fixed_lines)
-        df = pd.read_csv(io.StringIO(csv_string), sep=',')
-        
-        # If no output path specified, create one based on input filename
-        if excel_file_path is None:
-            base_name = os.path.splitext(csv_file_path)[0]
-            excel_file_path = f"{base_name}.xlsx"
-        
-        # Write to Excel file
-        with pd.ExcelWriter(excel_file_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Amazon Data', index=False)
-            
-            # Auto-adjust column widths
-            worksheet = writer.sheets['Amazon Data']
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        print(f"Successfully converted {csv_file_path} to {excel_file_path}")
-        return excel_file_path
+        result = convert_report(csv_file_path, excel_file_path, streaming=streaming,
+                                chunk_size=chunk_size, engine=engine, schema=schema,
+                                workers=workers, read_engine=read_engine, output_format=output_format,
+                                incremental=incremental, summaries=summaries, store=store)
+        print(f"Successfully converted {csv_file_path} to {result.output_path}")
+        print(f"{result.rows} rows in {result.seconds:.1f}s, {parse_summary(result)}")
+        return result.output_path
         
     except FileNotFoundError:
         print(f"Error: File {csv_file_path} not found")
@@ -68,31 +56,556 @@ def csv_to_excel(csv_file_path, excel_file_path=None):
         print(f"Error during conversion: {str(e)}")
         return None
 
-def main():
-    # Default CSV file
-    default_csv = "report-octobre.csv"
+def parse_summary(result):
+    """Describe the CSV parser of a conversion, with its parse time and memory when known"""
+    summary = f"parsed with {result.read_engine}"
+    if result.parse_seconds is not None:
+        summary += f" in {result.parse_seconds:.2f}s ({result.memory_mb:.1f} MB in memory)"
+    if result.incremental:
+        summary += f", output {result.incremental}"
+    if result.stored_rows is not None:
+        summary += f", {result.stored_rows} new rows stored"
+    return summary
+
+def expand_inputs(paths):
+    """
+    Expand CSV files, glob patterns and directories into a list of files
+    
+    Paths that match nothing are kept as-is so they are reported as failures.
+    Like watch mode, directories and patterns skip the files this tool writes
+    (cleaned *_clean.csv outputs and hidden temporary files), so running a
+    batch again does not convert its own outputs.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(file for file in glob.glob(os.path.join(path, "*.csv"))
+                                if not is_tool_output(file)))
+        elif glob.has_magic(path):
+            files.extend(sorted(file for file in glob.glob(path) if not is_tool_output(file)))
+        else:
+            files.append(path)
+    # Drop duplicates, keep order
+    return list(dict.fromkeys(files))
+
+def is_tool_output(path):
+    """Tell whether a file was written by this tool: a cleaned CSV or a temporary file"""
+    name = os.path.basename(path)
+    return name.startswith(".") or name.lower().endswith(OUTPUT_SUFFIXES["csv"])
+
+def is_output_path(path):
+    """
+    Tell whether the second of two arguments is the output file rather than
+    another input: a .xlsx, .parquet or .feather path, the output of an
+    earlier --incremental run (it has a manifest), or any path that is not an
+    existing file, directory or glob pattern
+    """
+    if FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv") != "csv":
+        return True
+    if os.path.exists(manifest_path(path)):
+        return True
+    return not os.path.exists(path) and not glob.has_magic(path)
+
+def convert_batch(csv_files, output_dir=None, workers=None, **options):
+    """
+    Convert several reports in parallel and print a per-file summary
+    
+    Args:
+        csv_files (list): Input CSV files
+        output_dir (str): Directory for the Excel files (default: next to each input)
+        workers (int): Number of worker processes (default: CPU count)
+        **options: Passed to convert_report (streaming, chunk_size, engine, schema, read_engine,
+            output_format, incremental, summaries, store)
+    
+    Returns:
+        int: Number of files that failed
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(csv_files))
+    output_format = options.get("output_format", "auto")
+    output_format = "xlsx" if output_format == "auto" else output_format
+    failures = 0
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_report, csv_file, default_output_path(csv_file, output_dir, output_format),
+                            **options): csv_file
+            for csv_file in csv_files
+        }
+        for future in as_completed(futures):
+            csv_file = futures[future]
+            try:
+                result = future.result()
+                print(f"OK     {csv_file}: {result.rows} rows in {result.seconds:.1f}s, "
+                      f"{parse_summary(result)} -> {result.output_path}")
+            except Exception as e:
+                failures += 1
+                print(f"FAILED {csv_file}: {str(e).strip()}")
+    
+    print(f"{len(csv_files) - failures}/{len(csv_files)} files converted")
+    return failures
+
+def merge_to_workbook(csv_files, excel_file_path, combined_sheet=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                      engine='auto', workers=None, schema='auto'):
+    """
+    Merge several reports into one workbook and print a per-sheet summary
+    
+    Returns:
+        int: 0 on success, 1 on failure
+    """
+    start = time.perf_counter()
+    try:
+        summary = merge_reports(csv_files, excel_file_path, combined_sheet=combined_sheet,
+                                chunk_size=chunk_size, engine=engine, workers=workers, schema=schema)
+    except Exception as e:
+        print(f"Error during merge: {str(e).strip()}")
+        return 1
+    
+    for csv_file, sheet_name, rows in summary:
+        print(f"OK     {csv_file}: {rows} rows -> sheet '{sheet_name}'")
+    if combined_sheet:
+        print(f"       {sum(rows for _, _, rows in summary)} rows -> sheet '{combined_sheet}'")
+    print(f"Merged {len(summary)} files into {excel_file_path} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+def add_conversion_arguments(parser):
+    """Options shared by every conversion command (format, parser, writer...)"""
+    parser.add_argument("--format", choices=FORMAT_CHOICES, default="auto", dest="output_format",
+                        help="Output format: xlsx (rolls over to extra sheets past Excel's row limit), "
+                             "parquet, feather or csv (cleaned, RFC 4180) "
+                             "(default: from the output file extension, else xlsx)")
+    parser.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=None,
+                        help="Convert chunk by chunk with bounded memory "
+                             "(default: automatic for large files)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows per chunk in streaming mode (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--engine", choices=ENGINE_CHOICES, default="auto",
+                        help="Excel writer backend (default: xlsxwriter if installed, else openpyxl)")
+    parser.add_argument("--read-engine", choices=READ_ENGINE_CHOICES, default="auto",
+                        help="CSV parser: pyarrow is multithreaded and stores text compactly "
+                             "(default: pyarrow if installed, else pandas' C parser)")
+    parser.add_argument("--schema", choices=["auto", "none"], default="auto",
+                        help="Column dtypes: 'auto' infers categories, numbers and dates; "
+                             "'none' keeps pandas defaults (default: auto)")
+    parser.add_argument("--summary", choices=["all"] + list(SUMMARIES), action="append", default=None,
+                        dest="summaries",
+                        help="Add a sheet of totals to the workbook, computed while converting: "
+                             "per SKU, per day, per marketplace, per transaction/fee type, or total "
+                             "per day and type (repeat the option, or 'all'; xlsx only)")
+    parser.add_argument("--store", metavar="DB_FILE", default=None,
+                        help="Also add the rows to this SQLite store (created if missing), skipping "
+                             "rows it already holds; query it with 'main.py store DB_FILE'")
+    parser.add_argument("--store-key", metavar="COLUMNS", default=None,
+                        help="Comma-separated columns identifying a row of the store, to skip "
+                             "duplicates of overlapping reports (default: every column; "
+                             "fixed when the store is created)")
+
+def add_diagnostic_arguments(parser):
+    """Logging and profiling options, shared by every command"""
+    parser.add_argument("--log-json", action="store_true",
+                        help="Log each conversion as a JSON line on stderr: stage timings, "
+                             "peak memory, rows per second, or the error it failed with")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="Profile the command with cProfile and write the stats to FILE "
+                             "(read them with: python -m pstats FILE); conversions run by "
+                             "worker processes are not profiled")
+
+@contextmanager
+def diagnostics(args):
+    """Apply --log-json, and profile the block with --profile"""
+    if args.log_json:
+        enable_json_logs()
+    if args.profile is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"Profile written to {args.profile}", file=sys.stderr)
+
+def usage_error(message, **fields):
+    """
+    Print a usage or validation error and, with --log-json, log it as a
+    refused conversion (status 'error')
     
-    # Check if CSV file argument is provided
-    if len(sys.argv) > 1:
-        csv_file = sys.argv[1]
-    else:
-        csv_file = default_csv
+    Args:
+        message (str): The error, without the "Error: " prefix
+        **fields: Fields of the log record (input, output...)
     
-    # Check if output file argument is provided
-    excel_file = sys.argv[2] if len(sys.argv) > 2 else None
+    Returns:
+        int: Exit code 1
+    """
+    print(f"Error: {message}")
+    log_usage_error(message, **fields)
+    return 1
+
+def log_usage_error(message, **fields):
+    """Log a usage error as a refused conversion, when JSON logs are enabled"""
+    try:
+        with log_conversion(**fields):
+            raise UsageError(message)
+    except UsageError:
+        pass
+
+class CommandParser(argparse.ArgumentParser):
+    """ArgumentParser whose usage errors are also logged with --log-json"""
+    
+    def parse_args(self, args=None, namespace=None):
+        self.log_json = "--log-json" in (sys.argv[1:] if args is None else args)
+        return super().parse_args(args, namespace)
+    
+    def error(self, message):
+        if getattr(self, "log_json", False):
+            enable_json_logs()
+            log_usage_error(message)
+        super().error(message)
+
+def conversion_options(args):
+    """convert_report keyword arguments from the options of add_conversion_arguments"""
+    return dict(streaming=args.streaming, chunk_size=args.chunk_size, engine=args.engine,
+                schema=None if args.schema == "none" else "auto",
+                read_engine=args.read_engine, output_format=args.output_format,
+                summaries=args.summaries, store=report_store(args))
+
+def report_store(args):
+    """ReportStore of --store and --store-key, or None"""
+    if args.store is None:
+        return None
+    key = [column.strip() for column in args.store_key.split(",")] if args.store_key else None
+    return ReportStore(args.store, key)
+
+# Watch mode: seconds between two scans of the folder, and number of
+# consecutive scans a file must keep the same size and mtime to be converted
+WATCH_POLL_SECONDS = 2.0
+WATCH_STABLE_SCANS = 2
+# Converted files are recorded here, in the output directory
+WATCH_STATE_FILE = ".converted.json"
+
+def convert_atomically(csv_file, output_file, output_format, **options):
+    """
+    Convert a report to a temporary file next to the output, then rename it
+    
+    Readers of the output folder never see a half-written file.
+    """
+    temp_file = os.path.join(os.path.dirname(output_file) or ".",
+                             f".{os.path.basename(output_file)}.{os.getpid()}.tmp")
+    try:
+        result = convert_report(csv_file, temp_file, output_format=output_format, **options)
+        os.replace(temp_file, output_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    result.output_path = output_file
+    return result
+
+def ignore_interrupts():
+    """Worker initializer: Ctrl+C stops the watcher, which lets running conversions finish"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def load_watch_state(state_file):
+    try:
+        with open(state_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_watch_state(state_file, state):
+    with open(f"{state_file}.tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2, ensure_ascii=False)
+    os.replace(f"{state_file}.tmp", state_file)
+
+def watch_folder(directory, output_dir=None, workers=None, poll_seconds=WATCH_POLL_SECONDS,
+                 once=False, **options):
+    """
+    Convert the reports dropped into a folder, until interrupted
+    
+    The folder is polled for *.csv files, skipping the outputs recorded in
+    its state and any file this tool writes (cleaned *_clean.csv outputs and
+    hidden temporary files). A file is queued once its size and
+    mtime have not changed for WATCH_STABLE_SCANS scans, so reports still
+    being copied are left alone. At most two files per worker are queued on
+    the process pool at a time; the workers stay alive between reports, so
+    Python and pandas start only once. Outputs are written atomically, and
+    each converted report is recorded with its mtime, size and SHA-256:
+    an unchanged file (same mtime, or same content) is not converted again.
+    
+    Args:
+        directory (str): Folder to watch
+        output_dir (str): Directory for the output files (default: the watched folder)
+        workers (int): Worker processes (default: CPU count)
+        poll_seconds (float): Seconds between two scans
+        once (bool): Exit once every stable report has been handled (for cron jobs)
+        **options: Passed to convert_report (output_format, streaming, engine...)
+    
+    Returns:
+        int: Number of files that failed
+    """
+    output_dir = output_dir or directory
+    os.makedirs(output_dir, exist_ok=True)
+    output_format = options.pop("output_format", "auto")
+    output_format = "xlsx" if output_format == "auto" else output_format
+    workers = workers or os.cpu_count() or 1
+    state_file = os.path.join(output_dir, WATCH_STATE_FILE)
+    state = load_watch_state(state_file)
+    outputs = {os.path.abspath(entry["output"]) for entry in state.values()}
+    # path -> (size, mtime, stable scans) of files not converted yet
+    candidates = {}
+    # path -> (size, mtime) of files that failed, retried once they change
+    failed = {}
+    in_flight = {}
+    failures = 0
+    
+    def collect(futures):
+        nonlocal failures
+        for future in futures:
+            csv_file, size, mtime, digest = in_flight.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                failed[csv_file] = (size, mtime)
+                print(f"FAILED {csv_file}: {str(e).strip()}")
+                continue
+            state[csv_file] = {"mtime": mtime, "size": size, "sha256": digest, "output": result.output_path}
+            outputs.add(os.path.abspath(result.output_path))
+            save_watch_state(state_file, state)
+            print(f"OK     {csv_file}: {result.rows} rows in {result.seconds:.1f}s -> {result.output_path}")
+    
+    print(f"Watching {directory} for CSV reports ({workers} workers, {output_format} output)")
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=ignore_interrupts)
+    try:
+        while True:
+            collect([future for future in in_flight if future.done()])
+            
+            seen = set()
+            for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+                csv_file = os.path.abspath(entry.path)
+                if (is_tool_output(entry.name) or not entry.name.lower().endswith(".csv")
+                        or not entry.is_file() or csv_file in outputs):
+                    continue
+                stat = entry.stat()
+                size, mtime = stat.st_size, stat.st_mtime
+                output_file = os.path.abspath(default_output_path(csv_file, output_dir, output_format))
+                converted = state.get(csv_file)
+                if converted and converted["output"] != output_file:
+                    # Converted before to another format or folder
+                    converted = None
+                if converted and (converted["size"], converted["mtime"]) == (size, mtime):
+                    continue
+                if failed.get(csv_file) == (size, mtime):
+                    continue
+                if any(queued[0] == csv_file for queued in in_flight.values()):
+                    continue
+                
+                seen.add(csv_file)
+                previous = candidates.get(csv_file)
+                stable = previous[2] + 1 if previous and previous[:2] == (size, mtime) else 0
+                candidates[csv_file] = (size, mtime, stable)
+                if stable < WATCH_STABLE_SCANS or len(in_flight) >= 2 * workers:
+                    continue
+                
+                seen.discard(csv_file)
+                digest, = hash_prefixes(csv_file, [size])
+                if converted and converted["sha256"] == digest:
+                    # Touched but not modified
+                    state[csv_file] = dict(converted, mtime=mtime)
+                    save_watch_state(state_file, state)
+                    print(f"SKIP   {csv_file}: already converted")
+                    continue
+                future = executor.submit(convert_atomically, csv_file, output_file, output_format, **options)
+                in_flight[future] = (csv_file, size, mtime, digest)
+                print(f"QUEUED {csv_file}")
+            # Forget files that were removed or queued
+            candidates = {path: candidate for path, candidate in candidates.items() if path in seen}
+            
+            if once and not in_flight and not candidates:
+                break
+            if in_flight:
+                wait(list(in_flight), timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("Stopping, waiting for the conversions in progress...")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        collect(list(in_flight))
+    return failures
+
+def watch_main(argv):
+    """main.py watch DIR: convert reports dropped into a folder"""
+    parser = CommandParser(
+        prog="main.py watch",
+        description="Watch a folder and convert every Amazon CSV report dropped into it"
+    )
+    parser.add_argument("directory", help="Folder to watch")
+    parser.add_argument("--output-dir", default=None,
+                        help="Directory for the output files (default: the watched folder)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Reports converted at once (default: CPU count)")
+    parser.add_argument("--poll", type=float, default=WATCH_POLL_SECONDS,
+                        help=f"Seconds between two scans of the folder (default: {WATCH_POLL_SECONDS})")
+    parser.add_argument("--once", action="store_true",
+                        help="Exit once the reports present in the folder are converted")
+    add_conversion_arguments(parser)
+    add_diagnostic_arguments(parser)
+    args = parser.parse_args(argv)
+    with diagnostics(args):
+        if not os.path.isdir(args.directory):
+            return usage_error(f"{args.directory} is not a directory", input=args.directory)
+        failures = watch_folder(args.directory, args.output_dir, args.workers, args.poll,
+                                once=args.once, **conversion_options(args))
+    return 1 if failures else 0
+
+def store_main(argv):
+    """main.py store DB_FILE: find or export rows of a report store"""
+    parser = CommandParser(
+        prog="main.py store",
+        description="Find the reports containing some rows of a store filled with --store, "
+                    "or export those rows to a new file without reparsing the reports"
+    )
+    parser.add_argument("store", help="SQLite store written by conversions with --store")
+    parser.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", default=None,
+                        help="First day of the rows")
+    parser.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", default=None,
+                        help="Last day of the rows (included)")
+    parser.add_argument("--order-id", default=None, help="Rows of this order")
+    parser.add_argument("--sku", default=None, help="Rows of this SKU")
+    parser.add_argument("--export", metavar="FILE", default=None,
+                        help="Write the rows to FILE (.xlsx, .parquet, .feather or .csv) "
+                             "instead of listing the reports containing them")
+    parser.add_argument("--format", choices=FORMAT_CHOICES, default="auto", dest="output_format",
+                        help="Format of the exported file (default: from its extension, else xlsx)")
+    parser.add_argument("--engine", choices=ENGINE_CHOICES, default="auto",
+                        help="Excel writer backend (default: xlsxwriter if installed, else openpyxl)")
+    add_diagnostic_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    filters = dict(date_from=args.date_from, date_to=args.date_to, order_id=args.order_id, sku=args.sku)
+    start = time.perf_counter()
+    try:
+        with diagnostics(args):
+            if not os.path.exists(args.store):
+                return usage_error(f"Store {args.store} does not exist", input=args.store, output=args.export)
+            store = ReportStore(args.store)
+            if args.export:
+                rows = store.export(args.export, output_format=args.output_format, engine=args.engine,
+                                    **filters)
+                print(f"Exported {rows} rows to {args.export} in {time.perf_counter() - start:.1f}s")
+                return 0
+            reports = store.find_reports(**filters)
+    except Exception as e:
+        print(f"Error: {str(e).strip()}")
+        return 1
+    
+    for path, rows, imported_at in reports:
+        print(f"{rows:>8} rows  {path} (stored {imported_at})")
+    print(f"{len(reports)} reports")
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "watch":
+        return watch_main(argv[1:])
+    if argv and argv[0] == "store":
+        return store_main(argv[1:])
+    
+    parser = CommandParser(
+        description="Convert Amazon CSV reports to Excel (or Parquet, Feather or a cleaned CSV)",
+        epilog="With a single CSV file, -o gives the output path (its format follows the extension, "
+               ".csv for a cleaned CSV, else xlsx). A second argument can give it too when it is "
+               "a .xlsx, .parquet or .feather file, the output of an earlier --incremental run, "
+               "or a file that does not exist yet; otherwise it is read as another input. "
+               "Several files, glob patterns or directories are converted in parallel. "
+               "'main.py watch DIR' converts the reports dropped into a folder. "
+               "'main.py store DB_FILE' finds or exports the rows of a store filled with --store."
+    )
+    parser.add_argument("inputs", nargs="*", default=["report-octobre.csv"],
+                        help="CSV files, glob patterns or directories (default: report-octobre.csv)")
+    parser.add_argument("-o", "--output", metavar="FILE", default=None,
+                        help="Output file of a single input, existing or not (default: next to the input)")
+    parser.add_argument("--output-dir", default=None,
+                        help="Directory for the output files in batch mode (default: next to each input)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes: files converted at once in batch mode (default: CPU count), "
+                             "or processes parsing a single file split in chunks (default: 1)")
+    parser.add_argument("--merge", metavar="EXCEL_FILE", default=None,
+                        help="Merge all inputs into one workbook, one sheet per file")
+    parser.add_argument("--combined-sheet", nargs="?", const="All", default=None, metavar="NAME",
+                        help="With --merge, also add a sheet with the rows of every file (default name: All)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Append only the rows added since the last run to the output, using a manifest "
+                             "stored next to it (parquet, feather and csv; xlsx is rebuilt)")
+    add_conversion_arguments(parser)
+    add_diagnostic_arguments(parser)
+    args = parser.parse_args(argv)
+    with diagnostics(args):
+        return convert_inputs(args)
+
+def convert_inputs(args):
+    """Convert, or merge, the reports given on the command line"""
+    options = dict(conversion_options(args), incremental=args.incremental)
+    schema = options["schema"]
+    
+    # Single file mode: main.py report.csv -o output_file, or main.py report.csv output_file
+    excel_file = args.output
+    inputs = args.inputs
+    if excel_file is None and len(inputs) == 2 and is_output_path(inputs[1]):
+        inputs, excel_file = inputs[:1], inputs[1]
+    
+    csv_files = expand_inputs(inputs)
+    if not csv_files:
+        return usage_error(f"No CSV file found in {', '.join(inputs)}", input=inputs)
+    if args.output and (len(csv_files) > 1 or args.merge):
+        return usage_error("--output takes a single input file (use --output-dir or --merge for several)",
+                           input=csv_files, output=args.output)
+    
+    if args.merge:
+        if args.output_format not in ("auto", "xlsx"):
+            return usage_error("--merge writes an Excel workbook, it cannot be combined with --format",
+                               input=csv_files, output=args.merge)
+        if args.summaries or args.store:
+            return usage_error("--summary and --store cannot be combined with --merge",
+                               input=csv_files, output=args.merge)
+        missing = [csv_file for csv_file in csv_files if not os.path.exists(csv_file)]
+        if missing:
+            return usage_error(f"File {missing[0]} does not exist", input=missing[0], output=args.merge)
+        return merge_to_workbook(csv_files, args.merge, combined_sheet=args.combined_sheet,
+                                 chunk_size=args.chunk_size, engine=args.engine, workers=args.workers,
+                                 schema=schema)
+    
+    if len(csv_files) > 1:
+        return 1 if convert_batch(csv_files, args.output_dir, args.workers, **options) else 0
+    
+    csv_file = csv_files[0]
     
     # Check if file exists
     if not os.path.exists(csv_file):
-        print(f"Error: File {csv_file} does not exist")
-        print(f"Usage: python main.py [csv_file] [excel_file]")
+        usage_error(f"File {csv_file} does not exist", input=csv_file, output=excel_file)
+        print(f"Usage: python main.py [csv_file] [-o output_file] [--format FORMAT] [--streaming] [--chunk-size N] [--engine NAME] [--workers N]")
+        print(f"       python main.py reports/*.csv [--output-dir DIR] [--workers N]")
+        print(f"       python main.py reports/ --merge all-reports.xlsx [--combined-sheet]")
         print(f"Example: python main.py report-octobre.csv report-octobre.xlsx")
-        return
+        return 1
+    
+    if excel_file is None and args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        excel_file = default_output_path(csv_file, args.output_dir,
+                                         "xlsx" if args.output_format == "auto" else args.output_format)
     
     # Convert CSV to Excel
-    result = csv_to_excel(csv_file, excel_file)
+    result = csv_to_excel(csv_file, excel_file, workers=args.workers, **options)
     
     if result:
-        print(f"Excel file created: {result}")
+        print(f"Output file created: {result}")
+        return 0
+    return 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+Headless HTTP conversion service, for ETL jobs
+
+    python service.py --port 8080
+    curl -T report.csv "http://localhost:8080/convert?format=parquet" -o report.parquet
+
+Endpoints:
+    POST|PUT /convert         Upload a report, get the converted file once done
+    POST|PUT /jobs            Upload a report, get its job id (202) without waiting
+    GET      /jobs/ID         Status of a job (JSON)
+    GET      /jobs/ID/result  Converted file of a finished job
+    DELETE   /jobs/ID         Cancel a job
+    GET      /metrics         Queue depth, latency percentiles and rows per second
+    GET      /health
+
+Uploads are spooled to disk as they arrive and converted by a bounded
+process pool: once every worker is busy and the queue is full, uploads are
+refused with 503 before their body is read. Results are streamed back from
+disk in blocks.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from converter import FORMAT_CHOICES, OUTPUT_SUFFIXES, ConversionJobs, JobQueueFull, enable_json_logs
+
+logger = logging.getLogger('converter.service')
+
+# Jobs waiting for a worker beyond which uploads get 503
+DEFAULT_MAX_QUEUED = 8
+
+# Largest upload accepted (413 beyond)
+DEFAULT_MAX_UPLOAD_MB = 2048
+
+# Bytes sent or received at a time
+TRANSFER_BLOCK_SIZE = 1024 * 1024
+
+# A refused upload is read and discarded up to this size, so that clients
+# which do not wait for "100 Continue" still get the answer; larger ones
+# get it with the connection closed
+MAX_DISCARD_BYTES = 64 * 1024 * 1024
+
+# Finished jobs the latency percentiles and throughput are computed over
+METRICS_WINDOW = 1000
+
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+class HTTPError(Exception):
+    """Error answered to the client with its status code"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class RequestBody(io.RawIOBase):
+    """
+    Body of a request, read from the socket as it is consumed
+
+    Bodies sent with a Content-Length are read up to it, chunked bodies
+    (Transfer-Encoding: chunked) are decoded on the fly. Beyond limit bytes,
+    reading raises HTTPError 413: chunked bodies do not announce their size.
+    """
+    def __init__(self, rfile, length=None, chunked=False, limit=None):
+        self.rfile = rfile
+        self.remaining = length
+        self.chunked = chunked
+        self.limit = limit
+        self.received = 0
+        self.started = False
+        self.done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        self.started = True
+        if self.done:
+            return 0
+        if self.chunked and not self.remaining:
+            # Next chunk: its size in hexadecimal, then the data
+            size_line = self.rfile.readline(1024)
+            try:
+                self.remaining = int(size_line.split(b';')[0], 16)
+            except ValueError:
+                raise HTTPError(400, "Malformed chunked body")
+            if self.remaining == 0:
+                # Trailers, up to an empty line
+                while self.rfile.readline(1024).strip():
+                    pass
+                self.done = True
+                return 0
+        size = min(len(buffer), self.remaining)
+        data = self.rfile.read(size)
+        if len(data) < size:
+            raise HTTPError(400, "Incomplete request body")
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        self.received += len(data)
+        if self.limit is not None and self.received > self.limit:
+            raise HTTPError(413, f"Reports are limited to {self.limit // (1024 * 1024)} MB")
+        if self.remaining == 0:
+            if self.chunked:
+                self.rfile.readline(1024)
+            else:
+                self.done = True
+        return len(data)
+
+class ServiceMetrics:
+    """Latency and throughput of the last finished jobs"""
+    def __init__(self, window=METRICS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.conversions = deque(maxlen=window)
+        self.finished = {'done': 0, 'failed': 0, 'cancelled': 0}
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def record(self, job):
+        """Done callback of a job: submission to end, and rows and seconds of its conversion"""
+        state = job.state
+        with self._lock:
+            self.finished[state] = self.finished.get(state, 0) + 1
+            if state == 'done':
+                self.latencies.append(job.finished_at - job.submitted_at)
+                self.conversions.append((job.result['rows'], job.result['seconds']))
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def percentile(self, fraction):
+        """Latency percentile (nearest rank), or None before the first job"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    def rows_per_second(self):
+        with self._lock:
+            rows = sum(rows for rows, _ in self.conversions)
+            seconds = sum(seconds for _, seconds in self.conversions)
+        return rows / seconds if seconds else None
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """Routes of the service; jobs and metrics are those of the server"""
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AmazonReportConverter/1.0'
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_expect_100(self):
+        # Refuse an upload before its body is sent when the queue is already full
+        if self.command in ('POST', 'PUT') and self.server.jobs.full():
+            self.server.metrics.reject()
+            self.close_connection = True
+            self.send_json(503, {'error': "Too many conversions in progress, retry later"})
+            return False
+        return super().handle_expect_100()
+
+    def handle_request(self, method):
+        self.body = None
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if method == 'POST' and parts in (['convert'], ['jobs']):
+                job_id = self.submit(query)
+                if parts == ['convert']:
+                    self.send_result(self.wait(job_id))
+                else:
+                    self.send_json(202, self.job_status(self.get_job(job_id)), location=f"/jobs/{job_id}")
+            elif method == 'GET' and len(parts) == 2 and parts[0] == 'jobs':
+                self.send_json(200, self.job_status(self.get_job(parts[1])))
+            elif method == 'GET' and len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+                self.send_result(self.get_job(parts[1]))
+            elif method == 'DELETE' and len(parts) == 2 and parts[0] == 'jobs':
+                self.get_job(parts[1])
+                self.server.jobs.cancel(parts[1])
+                self.send_json(202, self.job_status(self.get_job(parts[1])))
+            elif method == 'GET' and parts == ['metrics']:
+                self.send_metrics()
+            elif method == 'GET' and parts == ['health']:
+                self.send_json(200, {'status': 'ok'})
+            else:
+                raise HTTPError(404, f"No route for {method} {url.path}")
+            return
+        except HTTPError as e:
+            error = e
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        if method == 'POST' and not self.discard_body(error):
+            self.close_connection = True
+        try:
+            self.send_json(error.status, {'error': str(error)})
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def submit(self, query):
+        """Spool the uploaded report to disk and queue its conversion"""
+        output_format = query.get('format', 'xlsx')
+        if output_format not in FORMAT_CHOICES or output_format == 'auto':
+            raise HTTPError(400, f"Unknown format {output_format!r}, expected one of "
+                                 f"{', '.join(OUTPUT_SUFFIXES)}")
+        chunked = 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+        length = self.headers.get('Content-Length')
+        if not chunked and length is None:
+            raise HTTPError(411, "Send the report with a Content-Length or chunked")
+        if length is not None and int(length) > self.server.max_upload_bytes:
+            raise HTTPError(413, f"Reports are limited to {self.server.max_upload_bytes // (1024 * 1024)} MB")
+
+        body = self.body = RequestBody(self.rfile, int(length) if length is not None else None, chunked,
+                                       limit=self.server.max_upload_bytes)
+        options = {}
+        if query.get('sheet'):
+            options['sheet_name'] = query['sheet']
+        try:
+            job_id = self.server.jobs.submit(io.BufferedReader(body, TRANSFER_BLOCK_SIZE),
+                                             query.get('name', 'report.csv'), output_format, **options)
+        except JobQueueFull as e:
+            self.server.metrics.reject()
+            raise HTTPError(503, f"Too many conversions in progress ({e}), retry later")
+        self.server.jobs.get(job_id).future.add_done_callback(
+            lambda future, job=self.server.jobs.get(job_id): self.server.metrics.record(job))
+        return job_id
+
+    def discard_body(self, error):
+        """Read the unread body of a refused upload; False if the connection must be closed instead"""
+        length = self.headers.get('Content-Length')
+        chunked = 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+        if (not chunked and length is None) or (length is not None and int(length) > MAX_DISCARD_BYTES):
+            return False
+        body = self.body
+        if body is None:
+            body = RequestBody(self.rfile, int(length) if length is not None else None, chunked)
+        elif body.started and error.status != 413:
+            # Malformed or cut short: where the next request starts is unknown
+            return False
+        body.limit = MAX_DISCARD_BYTES
+        try:
+            while body.read(TRANSFER_BLOCK_SIZE):
+                pass
+        except HTTPError:
+            return False
+        return True
+
+    def wait(self, job_id):
+        job = self.get_job(job_id)
+        wait([job.future])
+        return job
+
+    def get_job(self, job_id):
+        job = self.server.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown or expired job {job_id}")
+        return job
+
+    def job_status(self, job):
+        status = {
+            'id': job.id,
+            'name': job.name,
+            'state': job.state,
+            'progress': round(job.progress, 3),
+        }
+        if job.state == 'done':
+            status.update(job.result, result=f"/jobs/{job.id}/result")
+        elif job.state == 'failed':
+            status['error'] = job.error
+        return status
+
+    def send_result(self, job):
+        """Stream the output of a finished job from disk"""
+        if job.state in ('pending', 'running'):
+            raise HTTPError(409, f"Job {job.id} is still {job.state}")
+        if job.state != 'done':
+            raise HTTPError(422, job.error or f"Job {job.id} was {job.state}")
+        try:
+            output = open(job.output_path, 'rb')
+        except OSError:
+            raise HTTPError(404, f"Output of job {job.id} expired")
+        with output:
+            output_format = next(name for name, suffix in OUTPUT_SUFFIXES.items()
+                                 if job.output_path.endswith(suffix))
+            file_name = os.path.splitext(os.path.basename(job.name))[0] + OUTPUT_SUFFIXES[output_format]
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPES[output_format])
+            self.send_header('Content-Length', str(os.fstat(output.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{file_name}"')
+            self.send_header('X-Rows', str(job.result['rows']))
+            self.end_headers()
+            while True:
+                block = output.read(TRANSFER_BLOCK_SIZE)
+                if not block:
+                    break
+                self.wfile.write(block)
+
+    def send_metrics(self):
+        """Prometheus text format"""
+        jobs, metrics = self.server.jobs, self.server.metrics
+        counts = jobs.counts()
+        lines = [
+            "# HELP converter_queue_depth Jobs waiting for a worker",
+            "# TYPE converter_queue_depth gauge",
+            f"converter_queue_depth {counts['pending']}",
+            "# HELP converter_jobs_running Jobs being converted",
+            "# TYPE converter_jobs_running gauge",
+            f"converter_jobs_running {counts['running']}",
+            "# HELP converter_workers Size of the process pool",
+            "# TYPE converter_workers gauge",
+            f"converter_workers {jobs.workers}",
+            "# HELP converter_jobs_total Jobs finished since start, by state",
+            "# TYPE converter_jobs_total counter",
+        ]
+        lines += [f'converter_jobs_total{{state="{state}"}} {count}' for state, count in metrics.finished.items()]
+        lines += [
+            "# HELP converter_jobs_rejected_total Uploads refused with 503",
+            "# TYPE converter_jobs_rejected_total counter",
+            f"converter_jobs_rejected_total {metrics.rejected}",
+            "# HELP converter_latency_seconds Submission to end of the last finished jobs",
+            "# TYPE converter_latency_seconds summary",
+        ]
+        for quantile in (0.5, 0.95):
+            latency = metrics.percentile(quantile)
+            lines.append(f'converter_latency_seconds{{quantile="{quantile}"}} '
+                         f'{"NaN" if latency is None else round(latency, 3)}')
+        rows_per_second = metrics.rows_per_second()
+        lines += [
+            "# HELP converter_rows_per_second Rows converted per second of conversion, last finished jobs",
+            "# TYPE converter_rows_per_second gauge",
+            f"converter_rows_per_second {'NaN' if rows_per_second is None else round(rows_per_second)}",
+        ]
+        self.send_body(200, "\n".join(lines).encode('utf-8') + b"\n", 'text/plain; version=0.0.4')
+
+    def send_json(self, status, data, location=None):
+        headers = {'Location': location} if location else {}
+        if status == 503:
+            headers['Retry-After'] = '5'
+        self.send_body(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json', headers)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(format % args, extra={'fields': {'event': 'request', 'client': self.client_address[0]}})
+        else:
+            super().log_message(format, *args)
+
+def make_server(jobs, host='127.0.0.1', port=8080, max_upload_mb=DEFAULT_MAX_UPLOAD_MB):
+    """
+    HTTP server of the service, one thread per connection
+
+    Port 0 picks a free port (see server.server_address), so tests can run
+    it in a thread with serve_forever() and call it with http.client.
+
+    Args:
+        jobs (ConversionJobs): Jobs runner, with max_queued set for backpressure
+        host (str): Address to listen on
+        port (int): Port to listen on
+        max_upload_mb (int): Largest report accepted, in MB
+    """
+    server = ThreadingHTTPServer((host, port), ConversionHandler)
+    server.daemon_threads = True
+    server.jobs = jobs
+    server.metrics = ServiceMetrics()
+    server.max_upload_bytes = max_upload_mb * 1024 * 1024
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="service.py",
+        description="HTTP service converting Amazon CSV reports to Excel, Parquet, Feather or cleaned CSV"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Reports converted at once, one process each (default: CPU count)")
+    parser.add_argument("--max-queued", type=int, default=DEFAULT_MAX_QUEUED,
+                        help=f"Reports waiting for a worker beyond which uploads get 503 "
+                             f"(default: {DEFAULT_MAX_QUEUED})")
+    parser.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_MB,
+                        help=f"Largest report accepted, in MB (default: {DEFAULT_MAX_UPLOAD_MB})")
+    parser.add_argument("--jobs-dir", default=os.path.join(tempfile.gettempdir(), "converter-service-jobs"),
+                        help="Directory the uploads and results are spooled to")
+    parser.add_argument("--ttl-min", type=float, default=60,
+                        help="Minutes a result is kept after its conversion (default: 60)")
+    parser.add_argument("--log-json", action="store_true",
+                        help="Log requests and conversions as JSON lines on stderr")
+    args = parser.parse_args(argv)
+
+    if args.log_json:
+        enable_json_logs()
+    jobs = ConversionJobs(args.jobs_dir, workers=args.workers, ttl=args.ttl_min * 60,
+                          max_queued=args.max_queued)
+    server = make_server(jobs, args.host, args.port, args.max_upload_mb)
+    host, port = server.server_address[:2]
+    print(f"Converting reports on http://{host}:{port} ({jobs.workers} workers, "
+          f"{args.max_queued} queued at most)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
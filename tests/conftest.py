@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from benchmark import generate_report
+
+
+@pytest.fixture
+def report(tmp_path):
+    """A small synthetic Amazon report, every row wrapped in outer quotes"""
+    path = tmp_path / "report.csv"
+    generate_report(str(path), 200)
+    return path
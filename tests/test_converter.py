@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import converter
+from benchmark import generate_report
+from converter import RepairedCSVReader, ReportStore, convert_report, output_format_for
+
+
+def reference_repair(path):
+    """Line by line repair: outer quotes removed and doubled quotes undone on wrapped rows"""
+    with open(path, encoding='utf-8-sig') as file:
+        header, *rows = file.read().splitlines()
+    rows = [row[1:-1].replace('""', '"') if row.startswith('"') and row.endswith('"') else row for row in rows]
+    return "\n".join([header] + rows) + "\n"
+
+
+@pytest.mark.parametrize("wrapped_ratio", [1.0, 0.5])
+@pytest.mark.parametrize("block_size", [7, 100, 4096, 1024 * 1024])
+def test_repair_matches_a_line_by_line_repair(tmp_path, wrapped_ratio, block_size):
+    path = tmp_path / "report.csv"
+    generate_report(str(path), 300, wrapped_ratio=wrapped_ratio)
+    with open(path, 'rb') as file:
+        repaired = RepairedCSVReader(file, block_size=block_size).read()
+
+    expected = pd.read_csv(io.StringIO(reference_repair(path)), dtype=str)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(repaired), encoding='utf-8-sig', dtype=str), expected)
+
+
+def test_streaming_and_whole_file_give_the_same_output(report, tmp_path):
+    whole = tmp_path / "whole_clean.csv"
+    streamed = tmp_path / "streamed_clean.csv"
+    convert_report(str(report), str(whole), streaming=False, read_engine='c')
+    convert_report(str(report), str(streamed), streaming=True, chunk_size=64, read_engine='c')
+    assert streamed.read_bytes() == whole.read_bytes()
+
+
+def test_c_and_pyarrow_parsers_give_the_same_output(report, tmp_path):
+    pytest.importorskip("pyarrow")
+    c_output = tmp_path / "c.parquet"
+    pyarrow_output = tmp_path / "pyarrow.parquet"
+    convert_report(str(report), str(c_output), streaming=False, read_engine='c')
+    convert_report(str(report), str(pyarrow_output), streaming=False, read_engine='pyarrow')
+    # Categories are listed in the order the parser met them
+    pd.testing.assert_frame_equal(pd.read_parquet(pyarrow_output), pd.read_parquet(c_output),
+                                  check_categorical=False)
+
+
+def test_rows_past_the_sheet_limit_roll_over(report, tmp_path, monkeypatch):
+    # 50 data rows per worksheet, under the header
+    monkeypatch.setattr(converter, 'EXCEL_MAX_ROWS', 51)
+    output = tmp_path / "report.xlsx"
+    convert_report(str(report), str(output), streaming=True, chunk_size=64)
+
+    workbook = openpyxl.load_workbook(output, read_only=True)
+    assert workbook.sheetnames == ["Amazon Data", "Amazon Data (2)", "Amazon Data (3)", "Amazon Data (4)"]
+    headers = [next(sheet.iter_rows(max_row=1, values_only=True)) for sheet in workbook.worksheets]
+    assert all(header == headers[0] for header in headers)
+    assert [sheet.max_row for sheet in workbook.worksheets] == [51, 51, 51, 51]
+
+
+def test_one_piece_arrow_output_keeps_integers(report, tmp_path):
+    pytest.importorskip("pyarrow")
+    whole = tmp_path / "whole.parquet"
+    streamed = tmp_path / "streamed.parquet"
+    convert_report(str(report), str(whole), streaming=False)
+    convert_report(str(report), str(streamed), streaming=True, chunk_size=64)
+
+    assert pd.api.types.is_integer_dtype(pd.read_parquet(whole)["quantité"])
+    assert pd.read_parquet(streamed)["quantité"].dtype == "float64"
+    pd.testing.assert_frame_equal(pd.read_parquet(streamed), pd.read_parquet(whole),
+                                  check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize("output_name", ["report_clean.csv", "report.parquet"])
+def test_incremental_run_appends_the_new_rows(report, tmp_path, output_name):
+    if output_name.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+    output = tmp_path / output_name
+    assert convert_report(str(report), str(output), incremental=True).incremental == 'rebuilt'
+    # Same seed: the first 200 rows are unchanged
+    generate_report(str(report), 260)
+    result = convert_report(str(report), str(output), incremental=True)
+    assert (result.incremental, result.rows) == ('appended', 60)
+    assert convert_report(str(report), str(output), incremental=True).incremental == 'unchanged'
+
+    full = tmp_path / ("full" + output_name[len("report"):])
+    convert_report(str(report), str(full))
+    read = pd.read_csv if output_name.endswith(".csv") else pd.read_parquet
+    pd.testing.assert_frame_equal(read(output), read(full), check_dtype=False)
+
+
+def test_store_skips_rows_of_overlapping_reports(report, tmp_path):
+    store = ReportStore(str(tmp_path / "rows.db"))
+    assert convert_report(str(report), str(tmp_path / "a_clean.csv"), store=store).stored_rows == 200
+    overlapping = tmp_path / "overlapping.csv"
+    generate_report(str(overlapping), 260)
+    assert convert_report(str(overlapping), str(tmp_path / "b_clean.csv"), store=store).stored_rows == 60
+
+    exported = tmp_path / "export_clean.csv"
+    assert store.export(str(exported)) == 260
+    assert len(pd.read_csv(exported)) == 260
+    sku = pd.read_csv(tmp_path / "a_clean.csv")["sku"][0]
+    assert {path for path, _, _ in store.find_reports(sku=sku)} >= {str(report), str(overlapping)}
+
+
+@pytest.mark.parametrize("output_path, output_format", [
+    ("out.xlsx", "parquet"), ("out.parquet", "xlsx"), ("out_clean.csv", "feather"),
+])
+def test_explicit_format_must_match_a_known_extension(output_path, output_format):
+    with pytest.raises(ValueError, match="extension"):
+        output_format_for(output_path, output_format)
+
+
+def test_explicit_format_is_kept_for_other_extensions():
+    assert output_format_for("out.dat", "parquet") == "parquet"
+    assert output_format_for("out.pq", "parquet") == "parquet"
+    assert output_format_for("out.feather", "auto") == "feather"
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import pandas as pd
+import pytest
+
+from benchmark import generate_report
+from converter import LOG_JSON_ENV, logger
+from main import main
+
+
+def test_second_argument_is_the_output_of_an_incremental_rerun(report, tmp_path):
+    output = tmp_path / "report_out.csv"
+    assert main([str(report), str(output), "--incremental"]) == 0
+    # The same report with more rows: the first ones are identical (same seed)
+    generate_report(str(report), 250)
+    assert main([str(report), str(output), "--incremental"]) == 0
+
+    assert len(pd.read_csv(output)) == 250
+    assert not (tmp_path / "report_out.xlsx").exists()
+    assert not (tmp_path / "report.xlsx").exists()
+
+
+def test_output_option_overwrites_an_existing_csv(report, tmp_path):
+    output = tmp_path / "cleaned.csv"
+    output.write_text("stale\n")
+    assert main([str(report), "-o", str(output)]) == 0
+    assert len(pd.read_csv(output)) == 200
+    assert not (tmp_path / "cleaned.xlsx").exists()
+
+
+def test_output_option_takes_a_single_input(report, tmp_path):
+    other = tmp_path / "other.csv"
+    generate_report(str(other), 10)
+    assert main([str(report), str(other), "-o", str(tmp_path / "out.xlsx")]) == 1
+    assert not (tmp_path / "out.xlsx").exists()
+
+
+def test_two_existing_reports_are_two_inputs(report, tmp_path):
+    other = tmp_path / "other.csv"
+    generate_report(str(other), 10)
+    assert main([str(report), str(other), "--format", "csv", "--workers", "1"]) == 0
+    assert len(pd.read_csv(tmp_path / "report_clean.csv")) == 200
+    assert len(pd.read_csv(tmp_path / "other_clean.csv")) == 10
+
+
+@pytest.fixture
+def json_logs(monkeypatch):
+    """Records of the 'converter' logger, with --log-json undone afterwards"""
+    # Set, so that its removal is undone too
+    monkeypatch.setenv(LOG_JSON_ENV, "")
+    monkeypatch.delenv(LOG_JSON_ENV)
+    handlers, level = list(logger.handlers), logger.level
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    yield records
+    logger.handlers[:], logger.level = handlers, level
+
+
+def test_missing_input_is_logged_as_an_error(json_logs, tmp_path):
+    missing = str(tmp_path / "nope.csv")
+    assert main([missing, str(tmp_path / "out.xlsx"), "--log-json"]) == 1
+    fields = [record.fields for record in json_logs]
+    assert fields and fields[-1]["status"] == "error"
+    assert fields[-1]["input"] == missing
+
+
+def test_invalid_argument_is_logged_as_an_error(json_logs):
+    with pytest.raises(SystemExit):
+        main(["report.csv", "--workers", "x", "--log-json"])
+    assert json_logs[-1].fields["status"] == "error"
+    assert "--workers" in json_logs[-1].fields["error"]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import http.client
+import io
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from converter import ConversionJobs
+from service import make_server
+
+
+@pytest.fixture
+def service(tmp_path):
+    """The service on a free port, one worker and no queue, uploads up to 1 MB"""
+    jobs = ConversionJobs(str(tmp_path / "jobs"), workers=1, max_queued=0)
+    server = make_server(jobs, port=0, max_upload_mb=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    jobs.shutdown()
+
+
+def connect(server):
+    return http.client.HTTPConnection(*server.server_address, timeout=60)
+
+
+def send_chunked(connection, url, blocks):
+    connection.putrequest("PUT", url)
+    connection.putheader("Transfer-Encoding", "chunked")
+    connection.endheaders()
+    for block in blocks:
+        connection.send(b"%x\r\n%s\r\n" % (len(block), block))
+
+
+def test_convert_streams_the_result(service, report):
+    connection = connect(service)
+    connection.request("PUT", "/convert?format=csv&name=report.csv", body=report.read_bytes())
+    response = connection.getresponse()
+
+    assert response.status == 200
+    assert response.getheader("X-Rows") == "200"
+    assert 'filename="report_clean.csv"' in response.getheader("Content-Disposition")
+    assert len(pd.read_csv(io.BytesIO(response.read()))) == 200
+
+
+def test_upload_over_the_limit_is_refused_from_its_content_length(service):
+    connection = connect(service)
+    connection.request("PUT", "/convert", body=b"x" * (2 * 1024 * 1024))
+    response = connection.getresponse()
+
+    assert response.status == 413
+    assert "1 MB" in json.loads(response.read())["error"]
+    assert service.jobs.counts() == dict.fromkeys(['pending', 'running', 'done', 'failed', 'cancelled'], 0)
+
+
+def test_chunked_upload_over_the_limit_is_refused(service):
+    connection = connect(service)
+    send_chunked(connection, "/convert", [b"x" * (64 * 1024)] * 32 + [b""])
+    response = connection.getresponse()
+
+    assert response.status == 413
+    assert "1 MB" in json.loads(response.read())["error"]
+    assert service.jobs.counts() == dict.fromkeys(['pending', 'running', 'done', 'failed', 'cancelled'], 0)
+    # The rest of the body was drained: the connection still serves requests
+    connection.request("GET", "/health")
+    assert connection.getresponse().status == 200
+
+
+def test_upload_is_refused_with_503_while_the_worker_is_busy(service, report):
+    data = report.read_bytes()
+    # An upload still being saved holds the only place
+    busy = connect(service)
+    send_chunked(busy, "/convert?format=csv", [data[:1000]])
+    deadline = time.time() + 30
+    while not service.jobs.full():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    connection = connect(service)
+    connection.request("PUT", "/convert?format=csv", body=data)
+    response = connection.getresponse()
+    assert response.status == 503
+    assert response.getheader("Retry-After") == "5"
+    response.read()
+
+    busy.send(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data) - 1000, data[1000:]))
+    response = busy.getresponse()
+    assert response.status == 200
+    assert len(pd.read_csv(io.BytesIO(response.read()))) == 200
@@ -1,9 +1,41 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
-import pandas as pd
-import io
 import os
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
 from datetime import datetime
+from converter import ConversionJobs, count_rows, get_backend, preview_report
+
+# Nom de la feuille Excel produite
+SHEET_NAME = 'Données Amazon'
+
+# Nombre de lignes affichées dans l'aperçu
+PREVIEW_ROWS = 5
+
+# Feuilles de synthèse proposées (voir converter.SUMMARIES)
+SUMMARY_LABELS = {
+    'sku': 'Totaux par SKU',
+    'day': 'Totaux par jour',
+    'marketplace': 'Totaux par marketplace',
+    'type': 'Totaux par type de transaction et de frais',
+    'day_type': 'Total par jour et par type',
+}
+
+# Cache disque des conversions, partagé entre les sessions
+CACHE_DIR = os.environ.get("CONVERTER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "convertisseur-csv-cache"))
+CACHE_MAX_BYTES = int(os.environ.get("CONVERTER_CACHE_MAX_MB", "500")) * 1024 * 1024
+
+# Conversions en arrière-plan, partagées entre les sessions : fichiers
+# téléchargés et convertis sur disque, supprimés après CONVERTER_JOB_TTL_MIN minutes
+JOBS_DIR = os.environ.get("CONVERTER_JOBS_DIR", os.path.join(tempfile.gettempdir(), "convertisseur-csv-jobs"))
+JOB_WORKERS = int(os.environ.get("CONVERTER_JOB_WORKERS", "0")) or None
+JOB_TTL_SECONDS = int(os.environ.get("CONVERTER_JOB_TTL_MIN", "60")) * 60
+
+# Intervalle de rafraîchissement de l'avancement d'une conversion
+JOB_POLL_SECONDS = 1
 
 # Configure page
 st.set_page_config(
@@ -63,58 +95,152 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def convert_csv_to_excel(csv_file):
+class ConversionCache:
     """
-    Convertit un fichier CSV au format Excel avec gestion appropriée du format CSV Amazon
+    Cache disque LRU des conversions, indexé par l'empreinte du fichier et les options
+    
+    Les fichiers les moins récemment utilisés sont supprimés dès que la taille
+    totale du cache dépasse max_bytes.
     """
-    try:
-        # Lire le contenu du fichier téléchargé
-        csv_content = csv_file.read().decode('utf-8-sig')
-        lines = csv_content.strip().split('\n')
-        
-        # Corriger le formatage CSV malformé
-        fixed_lines = []
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if i == 0:  # Ligne d'en-tête
-                fixed_lines.append(line)
-            else:  # Lignes de données - gérer les champs entre guillemets
-                if line.startswith('"') and line.endswith('"'):
-                    # Supprimer les guillemets extérieurs
-                    line = line[1:-1]
-                    # Corriger les doubles guillemets intérieurs
-                    line = line.replace('""', '"')
-                fixed_lines.append(line)
-        
-        # Créer le DataFrame
-        csv_string = '\n'.join(fixed_lines)
-        df = pd.read_csv(io.StringIO(csv_string), sep=',')
-        
-        # Créer le fichier Excel en mémoire
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Données Amazon', index=False)
-            
-            # Ajuster automatiquement la largeur des colonnes
-            worksheet = writer.sheets['Données Amazon']
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def key(self, data, **options):
+        """Clé de cache : SHA-256 du contenu téléchargé et des options de conversion"""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return f"{base}.xlsx", f"{base}.json"
+    
+    def get(self, key, count=True):
+        """
+        Retourne (chemin du fichier Excel, shape) si la conversion est en cache, sinon None
         
-        output.seek(0)
-        return output.getvalue(), df.shape
+        Seules les recherches avec count=True (clic sur Convertir) comptent
+        dans les succès et échecs ; le fichier réaffiché à chaque exécution
+        de la page est servi avec count=False.
+        """
+        excel_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as file:
+                    shape = tuple(json.load(file)['shape'])
+                # Marquer comme récemment utilisé
+                os.utime(excel_path)
+            except (OSError, ValueError, KeyError):
+                if count:
+                    self.misses += 1
+                return None
+            if count:
+                self.hits += 1
+            return excel_path, shape
+    
+    def put(self, key, source_path, shape):
+        """Enregistre le fichier Excel d'une conversion puis applique la limite de taille"""
+        excel_path, meta_path = self._paths(key)
+        with self._lock:
+            # Écriture atomique : fichier temporaire puis renommage. Le fichier
+            # converti est lié plutôt que copié quand le système le permet
+            tmp_path = f"{excel_path}.{threading.get_ident()}.tmp"
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, excel_path)
+            with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as tmp:
+                tmp.write(json.dumps({'shape': list(shape)}).encode('utf-8'))
+            os.replace(tmp.name, meta_path)
+            self._evict()
+    
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.xlsx'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
         
-    except Exception as e:
-        st.error(f"Erreur lors de la conversion du fichier : {str(e)}")
-        return None, None
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for stale in (path, os.path.splitext(path)[0] + '.json'):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+@st.cache_resource
+def get_conversion_cache():
+    """Cache de conversion unique pour tout le processus Streamlit"""
+    return ConversionCache(CACHE_DIR, CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_job_runner():
+    """Pool de conversions unique pour tout le processus Streamlit, partagé par les sessions"""
+    return ConversionJobs(JOBS_DIR, workers=JOB_WORKERS, ttl=JOB_TTL_SECONDS)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_id):
+    """
+    Affiche l'avancement d'une conversion en arrière-plan, rafraîchi chaque
+    seconde sans relancer toute la page, puis relance la page une fois terminée
+    """
+    job = get_job_runner().get(job_id)
+    if job is None or job.state not in ('pending', 'running'):
+        st.rerun()
+    
+    if job.state == 'pending':
+        text = "En attente d'un processus de conversion libre..."
+    else:
+        text = f"Conversion de votre fichier CSV au format Excel en cours : {job.progress:.0%}"
+    st.progress(job.progress, text=text)
+    if st.button("✖ Annuler la conversion"):
+        get_job_runner().cancel(job_id)
+
+def conversion_output(conversion):
+    """
+    Fichier Excel d'une conversion de la session, servi depuis le disque
+    
+    Returns:
+        tuple: (chemin du fichier Excel, shape), ou None si la conversion est
+        en cours, a échoué ou a expiré (un message est alors affiché)
+    """
+    cache = get_conversion_cache()
+    if conversion['job_id'] is not None:
+        job = get_job_runner().get(conversion['job_id'])
+        state = job.state if job is not None else 'expired'
+        if state in ('pending', 'running'):
+            show_job_progress(job.id)
+            return None
+        if state == 'done':
+            # Le résultat passe dans le cache : la session ne garde que sa clé
+            shape = (job.result['rows'], job.result['columns'])
+            cache.put(conversion['cache_key'], job.output_path, shape)
+            conversion['job_id'] = None
+        elif state == 'failed':
+            st.error(f"Erreur lors de la conversion du fichier : {job.error}")
+            return None
+        elif state == 'cancelled':
+            st.info("Conversion annulée")
+            return None
+    
+    cached = cache.get(conversion['cache_key'], count=False) if conversion['job_id'] is None else None
+    if cached is None:
+        st.warning("Le fichier converti a expiré, relancez la conversion.")
+    return cached
 
 def main():
     # En-tête
@@ -150,56 +276,88 @@ def main():
             st.metric("Type de fichier", uploaded_file.type)
         
         # Aperçu des données CSV
-        if st.checkbox("👀 Aperçu des données CSV", help="Afficher les 5 premières lignes de votre fichier CSV"):
+        if st.checkbox("👀 Aperçu des données CSV", help=f"Afficher les {PREVIEW_ROWS} premières lignes de votre fichier CSV"):
             try:
-                # Lire pour l'aperçu (réinitialiser le pointeur de fichier)
+                # N'analyser que les premières lignes et compter les autres sans les analyser
                 uploaded_file.seek(0)
-                preview_df = pd.read_csv(uploaded_file)
-                st.dataframe(preview_df.head(), use_container_width=True)
-                st.caption(f"Affichage des 5 premières lignes sur {len(preview_df)} lignes totales et {len(preview_df.columns)} colonnes")
+                preview_df = preview_report(uploaded_file, nrows=PREVIEW_ROWS)
+                total_rows = count_rows(uploaded_file)
+                st.dataframe(preview_df, use_container_width=True)
+                st.caption(f"Affichage des {len(preview_df)} premières lignes sur {total_rows} lignes totales et {len(preview_df.columns)} colonnes")
             except Exception as e:
                 st.warning(f"Impossible d'afficher l'aperçu du fichier : {str(e)}")
         
         # Bouton de conversion
         st.markdown("### 🔄 Convertir en Excel")
         
+        summaries = st.multiselect(
+            "📈 Feuilles de synthèse",
+            options=list(SUMMARY_LABELS),
+            format_func=SUMMARY_LABELS.get,
+            help="Ajouter au classeur des feuilles de totaux, calculées pendant la conversion"
+        )
+        
         if st.button("Convertir en Excel", type="primary", use_container_width=True):
-            with st.spinner("Conversion de votre fichier CSV au format Excel en cours..."):
-                # Réinitialiser le pointeur de fichier pour la conversion
+            # Réutiliser une conversion identique déjà en cache, sinon la lancer
+            # en arrière-plan : la session ne garde que l'identifiant de la tâche
+            cache = get_conversion_cache()
+            options = {'sheet_name': SHEET_NAME, 'engine': get_backend('auto').name}
+            if summaries:
+                options['summaries'] = summaries
+            cache_key = cache.key(uploaded_file.getbuffer(), **options)
+            job_id = None
+            if cache.get(cache_key) is None:
                 uploaded_file.seek(0)
-                excel_data, shape = convert_csv_to_excel(uploaded_file)
-                
-                if excel_data:
-                    # Stocker dans l'état de session pour le téléchargement
-                    st.session_state.excel_data = excel_data
-                    st.session_state.original_filename = uploaded_file.name
-                    st.session_state.conversion_time = datetime.now()
-                    st.session_state.data_shape = shape
-                    
-                    st.markdown(f"""
-                    <div class="success-message">
-                        <strong>✅ Conversion réussie !</strong><br>
-                        Votre fichier CSV a été converti au format Excel.<br>
-                        📊 Données : {shape[0]} lignes × {shape[1]} colonnes<br>
-                        ⏰ Converti le : {st.session_state.conversion_time.strftime("%d/%m/%Y à %H:%M:%S")}
-                    </div>
-                    """, unsafe_allow_html=True)
-    
-    # Section de téléchargement
-    if 'excel_data' in st.session_state:
+                job_id = get_job_runner().submit(uploaded_file, uploaded_file.name, **options)
+            
+            st.session_state.conversion = {
+                'job_id': job_id,
+                'cache_key': cache_key,
+                'original_filename': uploaded_file.name,
+                'conversion_time': datetime.now(),
+                'cached': job_id is None,
+            }
+    
+    # Avancement de la conversion, puis section de téléchargement
+    conversion = st.session_state.get('conversion')
+    output = conversion_output(conversion) if conversion is not None else None
+    if output is not None:
+        excel_path, shape = output
+        st.markdown(f"""
+        <div class="success-message">
+            <strong>✅ Conversion réussie !</strong><br>
+            Votre fichier CSV a été converti au format Excel.<br>
+            📊 Données : {shape[0]} lignes × {shape[1]} colonnes<br>
+            ⏰ Converti le : {conversion['conversion_time'].strftime("%d/%m/%Y à %H:%M:%S")}
+            {"<br>⚡ Résultat servi depuis le cache" if conversion['cached'] else ""}
+        </div>
+        """, unsafe_allow_html=True)
+        cache = get_conversion_cache()
+        st.caption(f"Cache de conversion : {cache.hits} succès, {cache.misses} échecs")
+        
         st.markdown("### 💾 Télécharger le fichier Excel")
         
         # Créer le nom de fichier
-        original_name = os.path.splitext(st.session_state.original_filename)[0]
+        original_name = os.path.splitext(conversion['original_filename'])[0]
         excel_filename = f"{original_name}_converti.xlsx"
         
-        st.download_button(
-            label="📥 Télécharger le fichier Excel",
-            data=st.session_state.excel_data,
-            file_name=excel_filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
+        # Streamlit garde en mémoire les données d'un bouton de téléchargement :
+        # le fichier n'est lu depuis le disque qu'à la demande de l'utilisateur,
+        # et libéré à la prochaine interaction plutôt qu'à chaque réexécution
+        if st.button("📦 Préparer le téléchargement", use_container_width=True):
+            try:
+                with open(excel_path, 'rb') as excel_file:
+                    st.download_button(
+                        label="📥 Télécharger le fichier Excel",
+                        data=excel_file,
+                        file_name=excel_filename,
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        on_click='ignore',
+                        type="primary",
+                        use_container_width=True
+                    )
+            except OSError:
+                st.warning("Le fichier converti a expiré, relancez la conversion.")
         
         # Informations supplémentaires
         st.info(f"💡 **Astuce :** Le fichier Excel sera sauvegardé sous le nom '{excel_filename}' dans votre dossier de téléchargements.")